@@ -0,0 +1,78 @@
+"""Latency saved by ending verdict calls once the approval phrase is in.
+
+Runs the workflow against the stub LLM server (src/llms/stub_server.py),
+which approves every review and then keeps talking for APPROVAL_PADDING
+tokens at TOKENS_PER_SECOND. Each run is repeated with early stop off and
+on; the table shows the verdict calls' latency and the whole run's wall
+time. No API keys or network access are needed.
+
+    python -m benchmarks.bench_early_stop
+"""
+
+import os
+import time
+import threading
+
+PORT = 8811
+os.environ.setdefault("OPENAI_BASE_URL", f"http://127.0.0.1:{PORT}/v1")
+os.environ.setdefault("OPENAI_API_KEY", "stub")
+# Cached replies would hide the latency of the non-streamed calls
+os.environ.setdefault("LLM_CACHE_ENABLED", "0")
+
+from src.llms.stub_server import make_server
+from src.nodes import workflow_nodes
+from src.nodes.common import LLMNode
+from src.ui.run_workflow import run_workflow
+
+RUNS = 3
+TOKENS_PER_SECOND = 200
+OUTPUT_TOKENS = 100
+APPROVAL_PADDING = 300
+ROUTING = {"default": {"provider": "openai", "model": "stub", "fallbacks": []}}
+VERDICT_NODES = {node.name for node in vars(workflow_nodes).values()
+                 if isinstance(node, LLMNode) and node.stop_phrase}
+
+
+def run(early_stop):
+    started = time.perf_counter()
+    result = run_workflow(checkpoint_path=None, options={"routing": ROUTING, "early_stop": early_stop})
+    wall = time.perf_counter() - started
+    verdicts = [call for call in result["llm_calls"] if call["node"] in VERDICT_NODES]
+    return wall, verdicts
+
+
+def main():
+    server = make_server(port=PORT, tokens_per_second=TOKENS_PER_SECOND, output_tokens=OUTPUT_TOKENS,
+                         approval_padding=APPROVAL_PADDING)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        print(f"{RUNS} runs each, {TOKENS_PER_SECOND} tokens/s, "
+              f"{APPROVAL_PADDING} tokens of commentary after each approval\n")
+        print(f"{'early stop':>10} {'verdicts':>9} {'stopped':>8} {'verdict s':>10} "
+              f"{'per verdict':>12} {'run s':>8}")
+        totals = {}
+        for early_stop in (False, True):
+            walls, verdict_seconds, count, stopped = [], [], 0, 0
+            for _ in range(RUNS):
+                wall, verdicts = run(early_stop)
+                walls.append(wall)
+                verdict_seconds.append(sum(call["latency_seconds"] for call in verdicts))
+                count += len(verdicts)
+                stopped += sum(call.get("early_stopped", False) for call in verdicts)
+            verdict_avg = sum(verdict_seconds) / RUNS
+            wall_avg = sum(walls) / RUNS
+            totals[early_stop] = (verdict_avg, wall_avg)
+            print(f"{'on' if early_stop else 'off':>10} {count / RUNS:>9.1f} {stopped / RUNS:>8.1f} "
+                  f"{verdict_avg:>10.2f} {verdict_avg / max(1, count / RUNS):>12.3f} {wall_avg:>8.2f}")
+
+        (verdict_off, wall_off), (verdict_on, wall_on) = totals[False], totals[True]
+        print(f"\nSaved {verdict_off - verdict_on:.2f} s of verdict latency per run "
+              f"({1 - verdict_on / verdict_off:.0%}), {wall_off - wall_on:.2f} s of wall time "
+              f"({1 - wall_on / wall_off:.0%})")
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
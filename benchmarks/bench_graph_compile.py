@@ -0,0 +1,48 @@
+"""Per-run cost of compiling the workflow graph versus reusing a compiled one.
+
+"build" compiles a fresh StateGraph and wraps every node, which is what each
+run used to do; "cached" is the get_workflow_graph lookup every run does
+now. Peak memory of one build is measured with tracemalloc. No LLM is called.
+
+    python -m benchmarks.bench_graph_compile
+"""
+
+import time
+import tracemalloc
+from src.graph.workflow import build_workflow_graph, get_workflow_graph
+
+RUNS = 50
+VARIANTS = [
+    ("sequential", {}),
+    ("parallel reviews", {"parallel_reviews": True}),
+    ("overlap + parallel ops", {"overlap_tests": True, "parallel_ops": True, "refine_ops": True}),
+    ("async", {"use_async": True}),
+]
+
+
+def measure(fn):
+    """Mean seconds per call, then peak traced memory of one call (timed without tracing)"""
+    started = time.perf_counter()
+    for _ in range(RUNS):
+        fn()
+    elapsed = (time.perf_counter() - started) / RUNS
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main():
+    print(f"{RUNS} runs per variant\n")
+    print(f"{'variant':<24} {'build ms':>9} {'peak KiB':>10} {'cached us':>10} {'speedup':>9}")
+    for name, options in VARIANTS:
+        build, build_peak = measure(lambda: build_workflow_graph(**options))
+        get_workflow_graph(**options)
+        cached, _ = measure(lambda: get_workflow_graph(**options))
+        print(f"{name:<24} {build * 1000:>9.2f} {build_peak / 1024:>10.0f} {cached * 1e6:>10.2f} "
+              f"{build / cached:>8.0f}x")
+
+
+if __name__ == "__main__":
+    main()
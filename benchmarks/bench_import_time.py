@@ -0,0 +1,47 @@
+
+"""Cold-start import time of the workflow modules.
+
+Each measurement runs in a fresh interpreter so nothing is served from
+sys.modules. "eager providers" imports every provider integration up front,
+which is what src/llms/factory.py used to do at module load; the other rows
+import the project modules as they are now and, for the last row, also build
+the Gemini client the way the first node call does.
+
+    python -m benchmarks.bench_import_time
+"""
+
+import sys
+import statistics
+import subprocess
+
+RUNS = 5
+
+SCENARIOS = {
+    "eager providers": "import langchain_groq, langchain_openai, langchain_google_genai, IPython.display",
+    "src.llms.factory": "import src.llms.factory",
+    "src.ui.run_workflow": "import src.ui.run_workflow",
+    "run_workflow + gemini": "import os; os.environ.setdefault('GOOGLE_API_KEY', 'x'); "
+                             "import src.ui.run_workflow; "
+                             "from src.llms.factory import get_llm; get_llm('google', 'gemini-2.0-flash')",
+}
+
+TIMER = "import time; _t = time.perf_counter(); {code}; print(time.perf_counter() - _t)"
+
+
+def measure(code):
+    samples = []
+    for _ in range(RUNS):
+        out = subprocess.run([sys.executable, "-c", TIMER.format(code=code)],
+                             capture_output=True, text=True, check=True)
+        samples.append(float(out.stdout.strip().splitlines()[-1]) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    print(f"{'scenario':<24} {'median ms':>10}")
+    for name, code in SCENARIOS.items():
+        print(f"{name:<24} {measure(code):>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
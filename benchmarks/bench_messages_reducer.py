@@ -0,0 +1,110 @@
+
+"""Per-node state overhead as the message history grows.
+
+Compares the old node pattern (copy the whole state and the whole message
+history on every step) with the append-only `messages` reducer where nodes
+return only their delta. No LLM is called; each node just produces two
+messages so the numbers isolate the orchestration cost.
+
+"node" columns time the node body alone, "step" columns time a full graph
+step including channel updates and the conditional edge. The last line
+compares the delta step at the largest and smallest history; it stays near 1x
+because the reducer appends in place.
+
+    python -m benchmarks.bench_messages_reducer
+"""
+
+import time
+from typing import TypedDict, List, Annotated
+from langchain_core.messages import HumanMessage, AIMessage
+from langgraph.graph import StateGraph, START, END
+from src.state.state import append_messages
+
+STEPS = 20
+HISTORY_SIZES = [10, 100, 1000, 10000]
+PAYLOAD = "x" * 2000
+
+
+class LegacyState(TypedDict):
+    generated_code: str
+    code_review_iteration: int
+    messages: List
+
+
+class DeltaState(TypedDict):
+    generated_code: str
+    code_review_iteration: int
+    messages: Annotated[List, append_messages]
+
+
+def legacy_node(state):
+    new_messages = state.get("messages", []) + [
+        HumanMessage(content=PAYLOAD), AIMessage(content=PAYLOAD)]
+    return {
+        **state,
+        "code_review_iteration": state["code_review_iteration"] + 1,
+        "messages": new_messages
+    }
+
+
+def delta_node(state):
+    return {
+        "code_review_iteration": state["code_review_iteration"] + 1,
+        "messages": [HumanMessage(content=PAYLOAD), AIMessage(content=PAYLOAD)]
+    }
+
+
+def build(schema, node):
+    builder = StateGraph(schema)
+    builder.add_node("coder", node)
+    builder.add_edge(START, "coder")
+    builder.add_conditional_edges(
+        "coder", lambda s: "coder" if s["code_review_iteration"] < STEPS else END)
+    return builder.compile()
+
+
+def make_state(history_size):
+    history = [AIMessage(content=PAYLOAD) for _ in range(history_size)]
+    return {"generated_code": PAYLOAD, "code_review_iteration": 0,
+            "messages": history}
+
+
+def node_us(node, history_size, repeat=200):
+    state = make_state(history_size)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        node(state)
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def step_us(graph, history_size, repeat=5):
+    """Best of `repeat` runs, so scheduler noise does not hide the scaling"""
+    best = float("inf")
+    for _ in range(repeat):
+        state = make_state(history_size)
+        start = time.perf_counter()
+        graph.invoke(state, {"recursion_limit": STEPS + 5})
+        best = min(best, time.perf_counter() - start)
+    return best / STEPS * 1e6
+
+
+def main():
+    legacy = build(LegacyState, legacy_node)
+    delta = build(DeltaState, delta_node)
+    # Warm up both graphs before timing
+    step_us(legacy, 10)
+    step_us(delta, 10)
+
+    print(f"{'history':>8} {'legacy node':>12} {'delta node':>11} "
+          f"{'legacy step':>12} {'delta step':>11}  (us)")
+    delta_steps = []
+    for size in HISTORY_SIZES:
+        delta_steps.append(step_us(delta, size))
+        print(f"{size:>8} {node_us(legacy_node, size):>12.1f} {node_us(delta_node, size):>11.1f} "
+              f"{step_us(legacy, size):>12.1f} {delta_steps[-1]:>11.1f}")
+    print(f"delta step at {HISTORY_SIZES[-1]} vs {HISTORY_SIZES[0]} messages: "
+          f"{delta_steps[-1] / delta_steps[0]:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
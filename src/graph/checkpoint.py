@@ -0,0 +1,68 @@
+
+import os
+import json
+import sqlite3
+import logging
+from functools import lru_cache
+from contextlib import asynccontextmanager
+
+logger = logging.getLogger(__name__)
+
+# SQLite file holding per-node checkpoints of every workflow run
+CHECKPOINT_PATH = os.getenv("WORKFLOW_CHECKPOINT_PATH", "workflow_checkpoints.sqlite")
+
+
+@lru_cache(maxsize=4)
+def get_checkpointer(path=CHECKPOINT_PATH):
+    """Return a SQLite checkpointer shared by all runs writing to `path`"""
+    try:
+        from langgraph.checkpoint.sqlite import SqliteSaver
+    except ImportError as e:
+        raise ImportError(
+            "Checkpointing requires the langgraph-checkpoint-sqlite package") from e
+    conn = sqlite3.connect(path, check_same_thread=False)
+    logger.info(f"Checkpointing workflow runs to {path}")
+    return SqliteSaver(conn)
+
+
+@asynccontextmanager
+async def aopen_checkpointer(path=CHECKPOINT_PATH):
+    """Async SQLite checkpointer on its own connection, closed when the block exits.
+
+    aiosqlite connections run a thread tied to one event loop, so each async
+    run opens its own rather than sharing one across loops.
+    """
+    try:
+        from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+    except ImportError as e:
+        raise ImportError(
+            "Checkpointing requires the langgraph-checkpoint-sqlite package") from e
+    async with AsyncSqliteSaver.from_conn_string(path) as checkpointer:
+        yield checkpointer
+
+
+def persisted_options(options):
+    """The JSON-serializable run options (routing, hedge, priority, ...) as JSON
+    text for checkpoint metadata, which keeps only flat values, so a resumed
+    run gets them back; callbacks and other objects are left out"""
+    persisted = {}
+    for key, value in (options or {}).items():
+        try:
+            json.dumps(value)
+        except (TypeError, ValueError):
+            continue
+        persisted[key] = value
+    return json.dumps(persisted, sort_keys=True)
+
+
+def run_config(run_id, options=None, **metadata):
+    """Graph config that checkpoints under `run_id` and records the run options
+
+    `options` are per-run values handed to the nodes through `configurable`
+    (callbacks and the like); only `metadata` is persisted with checkpoints.
+    """
+    return {
+        "configurable": {**(options or {}), "thread_id": run_id},
+        "metadata": metadata,
+        "recursion_limit": 100
+    }
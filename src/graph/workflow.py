@@ -1,8 +1,9 @@
 
+import threading
 from langgraph.graph import StateGraph, START, END
-from IPython.display import Image, display
 from src.state.state import GraphState, APPROVED_PHRASES, MAX_ITERATIONS
-from src.nodes.common import with_live_callback
+from src.nodes.common import with_live_callback, with_memo
+from src.nodes.memo import MEMOIZE, node_memo
 from src.nodes.workflow_nodes import (
     get_user_requirements_node,
     generate_user_stories_node,
@@ -12,12 +13,36 @@ from src.nodes.workflow_nodes import (
     coder_node,
     code_reviewer_node,
     security_review_node,
+    review_join_node,
+    code_ready_node,
+    tests_ready_node,
     write_test_cases_node,
     test_case_review_node,
     qa_testing_node,
     deployment_node,
     monitoring_feedback_node,
-    maintenance_updates_node
+    maintenance_updates_node,
+    refine_monitoring_node,
+    refine_maintenance_node,
+    aget_user_requirements_node,
+    agenerate_user_stories_node,
+    apo_review_stories_node,
+    acreate_design_doc_node,
+    adesign_doc_review_node,
+    acoder_node,
+    acode_reviewer_node,
+    asecurity_review_node,
+    areview_join_node,
+    acode_ready_node,
+    atests_ready_node,
+    awrite_test_cases_node,
+    atest_case_review_node,
+    aqa_testing_node,
+    adeployment_node,
+    amonitoring_feedback_node,
+    amaintenance_updates_node,
+    arefine_monitoring_node,
+    arefine_maintenance_node
 )
 import logging
 
@@ -27,56 +52,122 @@ logging.basicConfig(level=logging.INFO,
                     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+def token_budget_exhausted(state):
+    """Whether the run has spent its token budget (review loops then proceed anyway)"""
+    budget = state.get("token_budget") or 0
+    if budget and state.get("tokens_used", 0) >= budget:
+        logger.warning(f"Token budget exhausted ({state.get('tokens_used', 0)}/{budget}), proceeding anyway")
+        return True
+    return False
 
-def build_workflow_graph(live_callback=None):
-    """Build and return the workflow graph"""
+
+# Graph node name -> (sync node, async node)
+WORKFLOW_NODES = {
+    "get_user_requirements": (get_user_requirements_node, aget_user_requirements_node),
+    "generate_user_stories": (generate_user_stories_node, agenerate_user_stories_node),
+    "po_review_stories": (po_review_stories_node, apo_review_stories_node),
+    "create_design_doc": (create_design_doc_node, acreate_design_doc_node),
+    "design_doc_review": (design_doc_review_node, adesign_doc_review_node),
+    "coder": (coder_node, acoder_node),
+    "code_reviewer": (code_reviewer_node, acode_reviewer_node),
+    "security_review": (security_review_node, asecurity_review_node),
+    "review_join": (review_join_node, areview_join_node),
+    "code_ready": (code_ready_node, acode_ready_node),
+    "tests_ready": (tests_ready_node, atests_ready_node),
+    "write_test_cases": (write_test_cases_node, awrite_test_cases_node),
+    "test_case_review": (test_case_review_node, atest_case_review_node),
+    "qa_testing": (qa_testing_node, aqa_testing_node),
+    # "fix_code_after_qa": fix_code_after_qa_node,
+    "deployment": (deployment_node, adeployment_node),
+    "monitoring_feedback": (monitoring_feedback_node, amonitoring_feedback_node),
+    "maintenance_updates": (maintenance_updates_node, amaintenance_updates_node),
+    "refine_monitoring": (refine_monitoring_node, arefine_monitoring_node),
+    "refine_maintenance": (refine_maintenance_node, arefine_maintenance_node),
+}
+
+
+def build_workflow_graph(live_callback=None, parallel_reviews=False, use_async=False,
+                         checkpointer=None, overlap_tests=False, parallel_ops=False, refine_ops=False,
+                         memoize=MEMOIZE):
+    """Build and return the workflow graph
+
+    Runs normally share one compiled graph from get_workflow_graph; the
+    live callback then comes from the run config's `live_callback`.
+
+    With parallel_reviews the code review and the security review both start
+    from the coder node and run concurrently; review_join combines their
+    verdicts into a single routing decision.
+
+    With overlap_tests the test cases are written and reviewed as soon as
+    the design doc is approved, concurrently with the code review loop
+    (test authoring does not read the code, so only the security comments
+    available at that point go into it). Both loops end in a barrier node
+    and qa_testing waits for both. After a failed QA run the code loop goes
+    straight back to qa_testing with the already approved test cases.
+
+    With parallel_ops the deployment, monitoring and maintenance plans are
+    all drafted at once from the approved code and the requirement instead
+    of one after the other. With refine_ops as well, the monitoring and
+    maintenance drafts then get a revision pass against the deployment plan
+    (and the monitoring plan), run concurrently.
+
+    With use_async the graph is built from the async node variants and must
+    be driven with `ainvoke`, so many runs can share one event loop.
+
+    With a checkpointer the state is saved after every node, so an
+    interrupted run can be resumed from its last completed node.
+
+    With memoize (or the run config's `memoize`) an LLM node whose input
+    fields (its `reads`) and model settings were seen before, in this run
+    or an earlier one in the process, reuses that reply instead of calling
+    the model (see src/nodes/memo.py).
+
+    A state with `rerun_from` set starts at that stage instead of reading
+    the requirement (see run_incremental).
+    """
 
     builder = StateGraph(GraphState)
 
     # Add nodes
-    # builder.add_node("get_user_requirements", get_user_requirements_node)
-    builder.add_node("get_user_requirements", with_live_callback(
-        get_user_requirements_node, live_callback))
-    # builder.add_node("generate_user_stories", generate_user_stories_node)
-    builder.add_node("generate_user_stories", with_live_callback(
-        generate_user_stories_node, live_callback))
-    # builder.add_node("po_review_stories", po_review_stories_node)
-    builder.add_node("po_review_stories", with_live_callback(
-        po_review_stories_node, live_callback))
-    # builder.add_node("create_design_doc", create_design_doc_node)
-    builder.add_node("create_design_doc", with_live_callback(
-        create_design_doc_node, live_callback))
-    # builder.add_node("design_doc_review", design_doc_review_node)
-    builder.add_node("design_doc_review", with_live_callback(
-        design_doc_review_node, live_callback))
-    # builder.add_node("coder", coder_node)
-    builder.add_node("coder", with_live_callback(
-        coder_node, live_callback))
-    # builder.add_node("code_reviewer", code_reviewer_node)
-    builder.add_node("code_reviewer", with_live_callback(
-        code_reviewer_node, live_callback))
-    # builder.add_node("security_review", security_review_node)
-    builder.add_node("security_review", with_live_callback(
-        security_review_node, live_callback))
-    # builder.add_node("write_test_cases", write_test_cases_node)
-    builder.add_node("write_test_cases", with_live_callback(
-        write_test_cases_node, live_callback))
-    # builder.add_node("test_case_review", test_case_review_node)
-    builder.add_node("test_case_review", with_live_callback(
-        test_case_review_node, live_callback))
-    # builder.add_node("qa_testing", qa_testing_node)
-    builder.add_node("qa_testing", with_live_callback(
-        qa_testing_node, live_callback))
-    # builder.add_node("fix_code_after_qa", fix_code_after_qa_node)
-    # builder.add_node("deployment", deployment_node)
-    builder.add_node("deployment", with_live_callback(
-        deployment_node, live_callback))
-    # builder.add_node("monitoring_feedback", monitoring_feedback_node)
-    builder.add_node("monitoring_feedback", with_live_callback(
-        monitoring_feedback_node, live_callback))
-    # builder.add_node("maintenance_updates", maintenance_updates_node)
-    builder.add_node("maintenance_updates", with_live_callback(
-        maintenance_updates_node, live_callback))
+    for name, (sync_node, async_node) in WORKFLOW_NODES.items():
+        if name == "review_join" and not parallel_reviews:
+            continue
+        if name in ("code_ready", "tests_ready") and not overlap_tests:
+            continue
+        if name in ("refine_monitoring", "refine_maintenance") and not (parallel_ops and refine_ops):
+            continue
+        node = async_node if use_async else sync_node
+        node = with_memo(node, node_memo, memoize)
+        builder.add_node(name, with_live_callback(node, live_callback))
+
+    # With overlapped test authoring the design doc fans out to both loops
+    after_design = ["coder", "write_test_cases"] if overlap_tests else "coder"
+    after_tests = "tests_ready" if overlap_tests else "qa_testing"
+    # With parallel ops plans QA fans out to all three plans
+    after_qa = ["deployment", "monitoring_feedback", "maintenance_updates"] if parallel_ops else "deployment"
+    # Where an incremental re-run starts; earlier stages come seeded from the previous run
+    rerun_entries = {
+        "stories": "get_user_requirements",
+        "design": "create_design_doc",
+        "code": after_design,
+        # With overlapped tests the seeded code waits for the new tests at the barrier
+        "tests": ["code_ready", "write_test_cases"] if overlap_tests else "write_test_cases",
+        "qa": "qa_testing",
+        "ops": after_qa,
+    }
+
+    def rerun_condition(state):
+        entry = rerun_entries[state.get("rerun_from") or "stories"]
+        if state.get("rerun_from"):
+            logger.info(f"Re-running from {state['rerun_from']} ({entry})")
+        return entry
+
+    def after_code(state):
+        if not overlap_tests:
+            return "write_test_cases"
+        # Only the first pass meets the test branch at the barrier; after a
+        # failed QA run the approved test cases are already in the state
+        return "code_ready" if state.get("qa_testing_iteration", 1) <= 1 else "qa_testing"
 
     # Define conditional edge functions
     def review_condition_stories(state):
@@ -85,6 +176,8 @@ def build_workflow_graph(live_callback=None):
         if APPROVED_PHRASES["user_stories"] in state.get('po_review_comment', '').lower():
             logger.info("User stories approved")
             return "create_design_doc"
+        elif token_budget_exhausted(state):
+            return "create_design_doc"
         elif state.get('stories_correction_iteration', 0) < MAX_ITERATIONS:
             return "generate_user_stories"
         else:
@@ -96,13 +189,15 @@ def build_workflow_graph(live_callback=None):
             f"Design doc review count: {state.get('design_doc_review_iteration', 0)}")
         if APPROVED_PHRASES["design_doc"] in state.get("design_doc_review_comments", "").lower():
             logger.info("Design document approved")
-            return "coder"
+            return after_design
+        elif token_budget_exhausted(state):
+            return after_design
         elif state.get('design_doc_review_iteration', 0) < MAX_ITERATIONS:
             return "create_design_doc"
         else:
             logger.warning(
                 "Max design doc iterations reached, proceeding anyway")
-            return "coder"
+            return after_design
 
     def review_condition_code_review(state):
         logger.info(
@@ -110,6 +205,8 @@ def build_workflow_graph(live_callback=None):
         if APPROVED_PHRASES["code_review"] in state.get("code_review_comments", "").lower():
             logger.info("Code review passed")
             return "security_review"
+        elif token_budget_exhausted(state):
+            return "security_review"
         elif state.get('code_review_iteration', 0) < MAX_ITERATIONS:
             return "coder"
         else:
@@ -122,46 +219,71 @@ def build_workflow_graph(live_callback=None):
             f"Security review iteration: {state.get('security_review_iteration', 0)}")
         if APPROVED_PHRASES["security_review"] in state.get("security_review_comments", "").lower():
             logger.info("Security review passed")
-            return "write_test_cases"
+            return after_code(state)
+        elif token_budget_exhausted(state):
+            return after_code(state)
         elif state.get('security_review_iteration', 0) < MAX_ITERATIONS:
             return "coder"
         else:
             logger.warning(
                 "Max security review iterations reached, proceeding anyway")
-            return "write_test_cases"
+            return after_code(state)
+
+    def review_condition_joined_reviews(state):
+        logger.info(
+            f"Joined review iteration: {state.get('code_review_iteration', 0)}")
+        code_approved = APPROVED_PHRASES["code_review"] in state.get(
+            "code_review_comments", "").lower()
+        security_approved = APPROVED_PHRASES["security_review"] in state.get(
+            "security_review_comments", "").lower()
+        if code_approved and security_approved:
+            logger.info("Code review and security review passed")
+            return after_code(state)
+        elif token_budget_exhausted(state):
+            return after_code(state)
+        elif state.get('code_review_iteration', 0) < MAX_ITERATIONS:
+            return "coder"
+        else:
+            logger.warning(
+                "Max joined review iterations reached, proceeding anyway")
+            return after_code(state)
 
     def review_condition_testcase_review(state):
         logger.info(
             f"Test case review iteration: {state.get('test_case_review_iteration', 0)}")
         if APPROVED_PHRASES["test_case_review"] in state.get("test_case_review_comments", "").lower():
             logger.info("Test cases review passed")
-            return "qa_testing"
+            return after_tests
+        elif token_budget_exhausted(state):
+            return after_tests
         elif state.get('test_case_review_iteration', 0) < MAX_ITERATIONS:
             return "write_test_cases"
         else:
             logger.warning(
                 "Max test case review iterations reached, proceeding anyway")
-            return "qa_testing"
+            return after_tests
 
     def qa_testing_condition(state):
         logger.info(
             f"QA Testing iteration: {state.get('qa_testing_iteration', 0)}")
         if APPROVED_PHRASES["qa_testing"] in state.get("qa_testing_result", "").lower():
             logger.info("QA Testing Passed")
-            return "deployment"
+            return after_qa
         # else:
         #     logger.info("QA Testing Failed")
         #     return "coder"
+        elif token_budget_exhausted(state):
+            return after_qa
         elif state.get('qa_testing_iteration', 0) < MAX_ITERATIONS:
             logger.info("QA Testing Failed")
             return "coder"
         else:
             logger.warning(
                 "Max QA testing iteration reached, proceeding anyway")
-            return "deployment"
+            return after_qa
 
     # Define the edges
-    builder.add_edge(START, "get_user_requirements")
+    builder.add_conditional_edges(START, rerun_condition)
     # After getting requirements, generate user stories
     builder.add_edge("get_user_requirements", "generate_user_stories")
     # After Generating User Stories Product owner reviews user stories
@@ -178,18 +300,33 @@ def build_workflow_graph(live_callback=None):
         "design_doc_review",
         review_condition_design_doc
     )
-    # After coding, peer review of code
-    builder.add_edge("coder", "code_reviewer")
-    # Conditional edge for Code review.If approved proceed to security review else revise code
-    builder.add_conditional_edges(
-        "code_reviewer",
-        review_condition_code_review
-    )
-    # Conditional edge for security review.If approved proceed to test case creation else revise code
-    builder.add_conditional_edges(
-        "security_review",
-        review_condition_security_review
-    )
+    if parallel_reviews:
+        # After coding, peer review and security review run concurrently
+        builder.add_edge("coder", "code_reviewer")
+        builder.add_edge("coder", "security_review")
+        # Wait for both reviews before deciding
+        builder.add_edge(["code_reviewer", "security_review"], "review_join")
+        # Conditional edge for joined reviews. If both approved proceed to test case creation else revise code
+        builder.add_conditional_edges(
+            "review_join",
+            review_condition_joined_reviews
+        )
+    else:
+        # After coding, peer review of code
+        builder.add_edge("coder", "code_reviewer")
+        # Conditional edge for Code review.If approved proceed to security review else revise code
+        builder.add_conditional_edges(
+            "code_reviewer",
+            review_condition_code_review
+        )
+        # Conditional edge for security review.If approved proceed to test case creation else revise code
+        builder.add_conditional_edges(
+            "security_review",
+            review_condition_security_review
+        )
+    if overlap_tests:
+        # QA runs once both the code and the test case loops are done
+        builder.add_edge(["code_ready", "tests_ready"], "qa_testing")
     # After test case creation, test case review
     builder.add_edge("write_test_cases", "test_case_review")
     # Conditional edge for test case review. If approved proceed to qa testing else revise test cases
@@ -203,13 +340,50 @@ def build_workflow_graph(live_callback=None):
         qa_testing_condition
     )
     # builder.add_edge("fix_code_after_qa", "qa_testing")
-    builder.add_edge("deployment", "monitoring_feedback")
-    builder.add_edge("monitoring_feedback", "maintenance_updates")
-    builder.add_edge("maintenance_updates", END)
+    if parallel_ops and refine_ops:
+        # Each refinement waits for the plans it aligns with
+        builder.add_edge(["deployment", "monitoring_feedback"], "refine_monitoring")
+        builder.add_edge(["deployment", "monitoring_feedback", "maintenance_updates"], "refine_maintenance")
+        builder.add_edge("refine_monitoring", END)
+        builder.add_edge("refine_maintenance", END)
+    elif parallel_ops:
+        builder.add_edge("deployment", END)
+        builder.add_edge("monitoring_feedback", END)
+        builder.add_edge("maintenance_updates", END)
+    else:
+        builder.add_edge("deployment", "monitoring_feedback")
+        builder.add_edge("monitoring_feedback", "maintenance_updates")
+        builder.add_edge("maintenance_updates", END)
 
     # Build the graph
-    react_graph = builder.compile()
-    # Show
+    react_graph = builder.compile(checkpointer=checkpointer)
+    # Show (requires IPython)
+    # from IPython.display import Image, display
     # display(Image(react_graph.get_graph().draw_mermaid_png()))
 
     return react_graph
+
+
+_graphs = {}
+_graphs_lock = threading.Lock()
+
+
+def get_workflow_graph(parallel_reviews=False, use_async=False, checkpointer=None,
+                       overlap_tests=False, parallel_ops=False, refine_ops=False):
+    """The compiled workflow graph for these options, built once per process.
+
+    Only options that change the graph's shape are part of the key; live
+    callbacks, stream callbacks, memoization and the other per-run options
+    travel in the run config's `configurable`, so concurrent runs can share
+    one compiled graph.
+    """
+    key = (parallel_reviews, use_async, id(checkpointer), overlap_tests, parallel_ops, refine_ops)
+    with _graphs_lock:
+        # Compiled under the lock so concurrent first runs do not each build one
+        if key not in _graphs:
+            logger.info(f"Compiling workflow graph (parallel_reviews={parallel_reviews}, use_async={use_async}, "
+                        f"overlap_tests={overlap_tests}, parallel_ops={parallel_ops}, refine_ops={refine_ops})")
+            _graphs[key] = build_workflow_graph(parallel_reviews=parallel_reviews, use_async=use_async,
+                                                checkpointer=checkpointer, overlap_tests=overlap_tests,
+                                                parallel_ops=parallel_ops, refine_ops=refine_ops)
+        return _graphs[key]
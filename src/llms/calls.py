@@ -0,0 +1,322 @@
+
+import os
+import time
+import asyncio
+import logging
+from langchain_core.caches import BaseCache
+from langchain_core.load import dumps
+from langchain_core.messages import message_chunk_to_message
+from langchain_core.outputs import ChatGeneration
+from src.llms.limits import provider_slot, aprovider_slot, wait_for_rate_limit, await_rate_limit, estimate_tokens
+from src.llms.retry import DEFAULT_RETRY_POLICY, Deadline, LLMCallCancelled, acall_with_deadline
+
+logger = logging.getLogger(__name__)
+
+# Minimum seconds between two stream callback updates
+STREAM_MIN_INTERVAL = float(os.getenv("LLM_STREAM_MIN_INTERVAL", "0.1"))
+# End verdict calls as soon as their approval phrase has been streamed. Opt-in:
+# a reply cut short is not written to the response cache, and providers report
+# no usage for a stream closed early (it is estimated instead)
+EARLY_STOP = os.getenv("LLM_EARLY_STOP", "0") == "1"
+
+
+def chunk_text(chunk):
+    """Text of a streamed message chunk (content may be a list of parts)"""
+    content = chunk.content
+    if isinstance(content, str):
+        return content
+    return "".join(part.get("text", "") if isinstance(part, dict) else str(part)
+                   for part in content)
+
+
+class ChunkCoalescer:
+    """Accumulates streamed text and forwards it at a bounded rate.
+
+    The callback receives `(node_name, text_so_far)` at most once every
+    `min_interval` seconds, plus one final call with the complete text.
+    """
+
+    def __init__(self, node_name, callback, min_interval=STREAM_MIN_INTERVAL):
+        self.node_name = node_name
+        self.callback = callback
+        self.min_interval = min_interval
+        self.parts = []
+        self.pending = False
+        self.last_emit = 0.0
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+    def add(self, text):
+        if not text or self.cancelled:
+            return
+        self.parts.append(text)
+        self.pending = True
+        now = time.monotonic()
+        if now - self.last_emit >= self.min_interval:
+            self._emit(now)
+
+    def flush(self):
+        if self.pending and not self.cancelled:
+            self._emit(time.monotonic())
+
+    def _emit(self, now):
+        self.last_emit = now
+        self.pending = False
+        try:
+            self.callback(self.node_name, "".join(self.parts))
+        except Exception as e:
+            logger.error(f"Stream callback failed for {self.node_name}: {e}")
+
+
+def token_usage(response):
+    """Input/output/total token counts reported with a model response (zeros when
+    missing). A reply served from the response cache spent no tokens and is
+    marked `cached` instead."""
+    if (getattr(response, "response_metadata", None) or {}).get("cached"):
+        return {"input_tokens": 0, "output_tokens": 0, "total_tokens": 0, "cached": True}
+    usage = getattr(response, "usage_metadata", None) or {}
+    return {
+        "input_tokens": usage.get("input_tokens", 0),
+        "output_tokens": usage.get("output_tokens", 0),
+        "total_tokens": usage.get("total_tokens", 0),
+    }
+
+
+class PhraseStop:
+    """Watches streamed text for a phrase (case-insensitive) so the stream can end there"""
+
+    def __init__(self, phrase):
+        self.phrase = phrase.lower()
+        self.text = ""
+        self.end = None
+
+    def add(self, text):
+        """Append streamed text; True once the phrase has appeared"""
+        start = max(0, len(self.text) - len(self.phrase) + 1)
+        self.text += text
+        index = self.text[start:].lower().find(self.phrase)
+        if index != -1:
+            self.end = start + index + len(self.phrase)
+        return self.end is not None
+
+    def trim(self, response):
+        """The response cut off right after the phrase"""
+        return response.model_copy(update={"content": self.text[:self.end]})
+
+
+def _cache_entry(llm, messages):
+    """(cache, prompt, llm_string) under which llm.invoke caches this call, or None.
+
+    .stream() neither reads nor writes the model's cache, so streamed calls
+    look it up and fill it themselves under the same key.
+    """
+    cache = getattr(llm, "cache", None)
+    if not isinstance(cache, BaseCache):
+        return None
+    messages = [message.model_copy(update={"id": None}) if getattr(message, "id", None) else message
+                for message in llm._convert_input(messages).to_messages()]
+    return cache, dumps(messages), llm._get_llm_string()
+
+
+def _replay(cached, coalescer, stop):
+    """A cached reply passed through the stream callback and stop phrase like a streamed one"""
+    response = cached[0].message
+    text = chunk_text(response)
+    if coalescer is not None:
+        coalescer.add(text)
+        coalescer.flush()
+    if stop is not None and stop.add(text):
+        response = stop.trim(response)
+    return response
+
+
+def _cacheable(response, coalescer, stop):
+    """Whether a streamed reply was read to the end"""
+    return (response is not None and (stop is None or stop.end is None)
+            and (coalescer is None or not coalescer.cancelled))
+
+
+def _cached_generations(response):
+    return [ChatGeneration(message=message_chunk_to_message(response))]
+
+
+def _stream(llm, messages, coalescer=None, stop=None, deadline=None, cancel=None):
+    response = None
+    stream = llm.stream(messages)
+    try:
+        for chunk in stream:
+            if coalescer is not None and coalescer.cancelled:
+                break
+            if deadline is not None:
+                deadline.check()
+            _check_cancel(cancel)
+            response = chunk if response is None else response + chunk
+            text = chunk_text(chunk)
+            if coalescer is not None:
+                coalescer.add(text)
+            if stop is not None and stop.add(text):
+                response = stop.trim(response)
+                break
+    finally:
+        # Closing the generator ends the HTTP stream of an early-stopped call
+        stream.close()
+    if coalescer is not None:
+        coalescer.flush()
+    return response
+
+
+async def _astream(llm, messages, coalescer=None, stop=None):
+    response = None
+    stream = llm.astream(messages)
+    try:
+        async for chunk in stream:
+            response = chunk if response is None else response + chunk
+            text = chunk_text(chunk)
+            if coalescer is not None:
+                coalescer.add(text)
+            if stop is not None and stop.add(text):
+                response = stop.trim(response)
+                break
+    finally:
+        await stream.aclose()
+    if coalescer is not None:
+        coalescer.flush()
+    return response
+
+
+def _record_retry(metrics, node_name, policy, retry, error):
+    delay = policy.backoff(retry)
+    logger.warning(f"LLM call for {node_name} failed ({type(error).__name__}: {error}); "
+                   f"retry {retry + 1}/{policy.max_retries} in {delay:.2f}s")
+    if metrics is not None:
+        metrics["retries"] += 1
+        metrics["errors"].append(type(error).__name__)
+    return delay
+
+
+def _new_metrics(metrics):
+    if metrics is not None:
+        metrics.setdefault("retries", 0)
+        metrics.setdefault("errors", [])
+        metrics.setdefault("rate_limit_wait_seconds", 0.0)
+    return metrics
+
+
+def _check_cancel(cancel):
+    if cancel is not None and cancel.is_set():
+        raise LLMCallCancelled("LLM call cancelled")
+
+
+def _waited(metrics, seconds):
+    if metrics is not None:
+        metrics["rate_limit_wait_seconds"] += seconds
+
+
+def _timed(metrics, started):
+    # Time spent in the provider call alone, without rate-limit and slot waits
+    if metrics is not None:
+        metrics["provider_seconds"] = time.monotonic() - started
+
+
+def _stopped(response, messages, metrics, stop):
+    """Note an early stop and estimate the usage the provider did not report"""
+    if stop is None:
+        return response
+    if metrics is not None:
+        metrics["early_stopped"] = stop.end is not None
+    if stop.end is None or getattr(response, "usage_metadata", None):
+        return response
+    input_tokens = estimate_tokens(messages)
+    output_tokens = len(stop.text) // 4 + 1
+    if metrics is not None:
+        metrics["usage_estimated"] = True
+    return response.model_copy(update={"usage_metadata": {
+        "input_tokens": input_tokens, "output_tokens": output_tokens,
+        "total_tokens": input_tokens + output_tokens}})
+
+
+def invoke_llm(llm, messages, node_name=None, stream_callback=None, provider=None,
+               policy=DEFAULT_RETRY_POLICY, metrics=None, priority=None, stop_phrase=None, cancel=None):
+    """Call the model, streaming tokens to `stream_callback` when one is given.
+
+    Each attempt holds one of the provider's concurrency slots, and only
+    then waits for its rate limits, so `priority` ("interactive" or
+    "batch"), which decides who gets a slot first when calls queue, also
+    decides who spends the rate budget first. Attempts that
+    fail with a retryable error or run past the policy deadline are retried
+    with backoff; retry counts are written to the optional `metrics` dict.
+    With a `stop_phrase` the reply is streamed and cut off as soon as the
+    phrase appears. With a `cancel` event the reply is streamed too, and
+    the call raises LLMCallCancelled at the next chunk once it is set.
+    """
+    _new_metrics(metrics)
+    # Plain invoke calls go through the model's own cache lookup
+    entry = _cache_entry(llm, messages) if stream_callback or stop_phrase or cancel else None
+    if entry is not None:
+        cached = entry[0].lookup(entry[1], entry[2])
+        if cached:
+            stop = PhraseStop(stop_phrase) if stop_phrase else None
+            coalescer = ChunkCoalescer(node_name, stream_callback) if stream_callback else None
+            return _stopped(_replay(cached, coalescer, stop), messages, metrics, stop)
+    retry = 0
+    while True:
+        coalescer = ChunkCoalescer(node_name, stream_callback) if stream_callback else None
+        stop = PhraseStop(stop_phrase) if stop_phrase else None
+        try:
+            with provider_slot(provider, priority):
+                _waited(metrics, wait_for_rate_limit(provider, messages))
+                _check_cancel(cancel)
+                started = time.monotonic()
+                if coalescer is None and stop is None and cancel is None:
+                    response = llm.invoke(messages)
+                else:
+                    response = _stream(llm, messages, coalescer, stop, Deadline(policy.deadline), cancel)
+                    if entry is not None and _cacheable(response, coalescer, stop):
+                        entry[0].update(entry[1], entry[2], _cached_generations(response))
+                _timed(metrics, started)
+                return _stopped(response, messages, metrics, stop)
+        except Exception as e:
+            if coalescer is not None:
+                # Stop an abandoned stream from writing to the UI
+                coalescer.cancel()
+            if retry >= policy.max_retries or not policy.is_retryable(e):
+                raise
+            time.sleep(_record_retry(metrics, node_name, policy, retry, e))
+            retry += 1
+
+
+async def ainvoke_llm(llm, messages, node_name=None, stream_callback=None, provider=None,
+                      policy=DEFAULT_RETRY_POLICY, metrics=None, priority=None, stop_phrase=None):
+    """Async counterpart of invoke_llm"""
+    _new_metrics(metrics)
+    entry = _cache_entry(llm, messages) if stream_callback or stop_phrase else None
+    if entry is not None:
+        cached = await entry[0].alookup(entry[1], entry[2])
+        if cached:
+            stop = PhraseStop(stop_phrase) if stop_phrase else None
+            coalescer = ChunkCoalescer(node_name, stream_callback) if stream_callback else None
+            return _stopped(_replay(cached, coalescer, stop), messages, metrics, stop)
+    retry = 0
+    while True:
+        try:
+            async with aprovider_slot(provider, priority):
+                _waited(metrics, await await_rate_limit(provider, messages))
+                started = time.monotonic()
+                coalescer = ChunkCoalescer(node_name, stream_callback) if stream_callback else None
+                stop = PhraseStop(stop_phrase) if stop_phrase else None
+                if coalescer is None and stop is None:
+                    response = await acall_with_deadline(lambda: llm.ainvoke(messages), policy.deadline)
+                else:
+                    response = await acall_with_deadline(
+                        lambda: _astream(llm, messages, coalescer, stop), policy.deadline)
+                    if entry is not None and _cacheable(response, coalescer, stop):
+                        await entry[0].aupdate(entry[1], entry[2], _cached_generations(response))
+                _timed(metrics, started)
+                return _stopped(response, messages, metrics, stop)
+        except Exception as e:
+            if retry >= policy.max_retries or not policy.is_retryable(e):
+                raise
+            await asyncio.sleep(_record_retry(metrics, node_name, policy, retry, e))
+            retry += 1
@@ -0,0 +1,196 @@
+
+import os
+import gzip
+import json
+import time
+import asyncio
+import hashlib
+import logging
+import threading
+from collections import defaultdict, deque
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatResult, ChatGeneration, ChatGenerationChunk
+
+logger = logging.getLogger(__name__)
+
+# "record" appends every LLM call of a live run to the cassette, "replay"
+# answers every call from it without touching the network
+CASSETTE_MODE = os.getenv("LLM_CASSETTE_MODE", "").lower()
+# JSON lines, gzip-compressed when the name ends in .gz
+CASSETTE_PATH = os.getenv("LLM_CASSETTE_PATH", "llm_cassette.jsonl.gz")
+# Replay delay per call: "recorded" sleeps as long as the live call took, a number sleeps that many seconds
+CASSETTE_LATENCY = os.getenv("LLM_CASSETTE_LATENCY", "recorded")
+
+
+class CassetteMiss(LookupError):
+    """A replayed call has no recorded response"""
+
+
+def messages_key(messages):
+    """Content address of a prompt: the role and content of each message"""
+    payload = json.dumps([[message.type, message.content] for message in messages],
+                         sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _open(path, mode):
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+class CassetteRecorder(BaseCallbackHandler):
+    """Callback handler that appends each finished chat model call to the cassette"""
+
+    run_inline = True
+
+    def __init__(self, path=CASSETTE_PATH):
+        self.path = path
+        self.recorded = 0
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        self._pending[run_id] = (messages_key(messages[0]), time.monotonic())
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        self._record(run_id, response)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        # A stream closed by the caller (early stop) is kept with what it
+        # produced so far, which is all the run ever saw of it
+        response = kwargs.get("response")
+        if isinstance(error, GeneratorExit) and response is not None and response.generations:
+            self._record(run_id, response)
+        else:
+            self._pending.pop(run_id, None)
+
+    def _record(self, run_id, response):
+        pending = self._pending.pop(run_id, None)
+        if pending is None:
+            return
+        key, started = pending
+        message = response.generations[0][0].message
+        entry = {
+            "key": key,
+            "content": message.content,
+            "usage": getattr(message, "usage_metadata", None),
+            "latency": round(time.monotonic() - started, 3),
+        }
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        with self._lock:
+            # Each append adds a gzip member; readers see one continuous stream
+            with _open(self.path, "a") as f:
+                f.write(line)
+            self.recorded += 1
+
+
+class Cassette:
+    """Recorded responses by prompt key, handed out in recording order"""
+
+    def __init__(self, path=CASSETTE_PATH):
+        self.path = path
+        self._entries = defaultdict(deque)
+        self._last = {}
+        self._lock = threading.Lock()
+        with _open(path, "r") as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    self._entries[entry["key"]].append(entry)
+        logger.info(f"Replaying {sum(len(e) for e in self._entries.values())} LLM calls from {path}")
+
+    def next(self, messages):
+        """Next recorded response for this prompt; the last one repeats once they run out"""
+        key = messages_key(messages)
+        with self._lock:
+            if self._entries[key]:
+                self._last[key] = self._entries[key].popleft()
+            if key not in self._last:
+                raise CassetteMiss(f"No recorded response for prompt {key[:12]} in {self.path}")
+            return self._last[key]
+
+
+class ReplayChatModel(BaseChatModel):
+    """Chat model that answers from a cassette, optionally with the recorded latency"""
+
+    cassette: Cassette
+    latency: str = CASSETTE_LATENCY
+
+    model_config = {"arbitrary_types_allowed": True}
+
+    @property
+    def _llm_type(self):
+        return "cassette-replay"
+
+    def _delay(self, entry):
+        if self.latency == "recorded":
+            return entry["latency"]
+        return float(self.latency or 0)
+
+    @staticmethod
+    def _result(entry):
+        message = AIMessage(content=entry["content"], usage_metadata=entry["usage"])
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    @staticmethod
+    def _chunks(entry):
+        content = entry["content"]
+        if not isinstance(content, str):
+            return [content]
+        # Word-sized pieces that join back to the exact recorded text
+        return [word + " " for word in content.split(" ")[:-1]] + [content.split(" ")[-1]]
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        entry = self.cassette.next(messages)
+        time.sleep(self._delay(entry))
+        return self._result(entry)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        entry = self.cassette.next(messages)
+        await asyncio.sleep(self._delay(entry))
+        return self._result(entry)
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        entry = self.cassette.next(messages)
+        chunks = self._chunks(entry)
+        for index, text in enumerate(chunks):
+            time.sleep(self._delay(entry) / len(chunks))
+            last = index == len(chunks) - 1
+            yield ChatGenerationChunk(message=AIMessageChunk(
+                content=text, usage_metadata=entry["usage"] if last else None))
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        entry = self.cassette.next(messages)
+        chunks = self._chunks(entry)
+        for index, text in enumerate(chunks):
+            await asyncio.sleep(self._delay(entry) / len(chunks))
+            last = index == len(chunks) - 1
+            yield ChatGenerationChunk(message=AIMessageChunk(
+                content=text, usage_metadata=entry["usage"] if last else None))
+
+
+_recorder = None
+_replay_model = None
+_cassette_lock = threading.Lock()
+
+
+def get_cassette_recorder(path=CASSETTE_PATH):
+    """Process-wide recorder used in record mode"""
+    global _recorder
+    with _cassette_lock:
+        if _recorder is None:
+            _recorder = CassetteRecorder(path)
+            logger.info(f"Recording LLM calls to {path}")
+        return _recorder
+
+
+def get_replay_model(path=CASSETTE_PATH):
+    """Process-wide replay model used in replay mode"""
+    global _replay_model
+    with _cassette_lock:
+        if _replay_model is None:
+            _replay_model = ReplayChatModel(cassette=Cassette(path))
+        return _replay_model
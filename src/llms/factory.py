@@ -1,10 +1,14 @@
 
 import os
+import asyncio
 import logging
+import weakref
+import importlib
+import threading
 from functools import lru_cache
-from langchain_groq import ChatGroq
-from langchain_openai import ChatOpenAI
-from langchain_google_genai import ChatGoogleGenerativeAI
+from src.llms.cache import get_llm_cache
+from src.llms.retry import CALL_DEADLINE
+from src.llms.cassette import CASSETTE_MODE, get_cassette_recorder, get_replay_model
 
 logger = logging.getLogger(__name__)
 
@@ -16,23 +20,130 @@ API_KEYS = {
     "GOOGLE_API_KEY": os.getenv("GOOGLE_API_KEY")
 }
 
+# Environment variable holding each provider's API key
+PROVIDER_API_KEYS = {"groq": "GROQ_API_KEY", "google": "GOOGLE_API_KEY", "openai": "OPENAI_API_KEY"}
+
+# OpenAI-compatible endpoint for the openai provider, e.g. the local stub server
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL")
+
+# Connection limits of each HTTP pool (sync and async) shared by the groq and openai clients
+HTTP_MAX_CONNECTIONS = int(os.getenv("LLM_HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("LLM_HTTP_MAX_KEEPALIVE", "20"))
+
 # Set environment variables
 # for key, value in API_KEYS.items():
 #     if value:
 #         os.environ[key] = value
 
+# Provider integrations are imported on first use so that startup only pays
+# for the providers a run actually calls
+PROVIDER_CLASSES = {
+    "groq": ("langchain_groq", "ChatGroq"),
+    "google": ("langchain_google_genai", "ChatGoogleGenerativeAI"),
+    "openai": ("langchain_openai", "ChatOpenAI"),
+}
+
+
+@lru_cache(maxsize=None)
+def load_provider(model_type):
+    """Import and return the chat model class for a provider"""
+    if model_type not in PROVIDER_CLASSES:
+        raise ValueError(f"Unsupported model type: {model_type}")
+    module_name, class_name = PROVIDER_CLASSES[model_type]
+    return getattr(importlib.import_module(module_name), class_name)
+
+
+def http_limits():
+    import httpx
+    return httpx.Limits(max_connections=HTTP_MAX_CONNECTIONS, max_keepalive_connections=HTTP_MAX_KEEPALIVE)
+
+
+@lru_cache(maxsize=None)
+def shared_http_client():
+    """Keep-alive HTTP connection pool shared by the groq and openai clients of this process"""
+    import httpx
+    return httpx.Client(limits=http_limits())
+
+
+@lru_cache(maxsize=None)
+def shared_async_http_client():
+    """Async counterpart of shared_http_client, used by `ainvoke`/`astream`.
+
+    Connections opened on one event loop cannot be used from another, so
+    each loop gets its own pool with the same limits. The google client takes
+    no HTTP client (google-genai manages its own connections), so Gemini
+    calls do not share either pool.
+    """
+    import httpx
+
+    class PerLoopTransport(httpx.AsyncBaseTransport):
+        def __init__(self):
+            self._transports = weakref.WeakKeyDictionary()
+            self._lock = threading.Lock()
+
+        def _transport(self):
+            loop = asyncio.get_running_loop()
+            with self._lock:
+                if loop not in self._transports:
+                    self._transports[loop] = httpx.AsyncHTTPTransport(limits=http_limits())
+                return self._transports[loop]
+
+        async def handle_async_request(self, request):
+            return await self._transport().handle_async_request(request)
+
+        async def aclose(self):
+            await self._transport().aclose()
+
+    return httpx.AsyncClient(transport=PerLoopTransport())
+
+
+def has_credentials(model_type):
+    """Whether a provider's API key is set (replayed runs need none)"""
+    return CASSETTE_MODE == "replay" or bool(os.getenv(PROVIDER_API_KEYS.get(model_type, "")))
+
 
-@lru_cache(maxsize=16)
-def get_llm(model_type, model_name=None):
+def get_llm(model_type, model_name=None, temperature=None, max_tokens=None):
+    """Build a new chat model client; calls check clients out of src/llms/pool.py instead"""
+    if CASSETTE_MODE == "replay":
+        # Offline run: every provider answers from the recorded cassette
+        return get_replay_model()
+    # Responses are served from the persistent cache when the same
+    # provider/model/params/messages combination has been seen before
+    cache = get_llm_cache()
+    params = {"cache": cache}
+    if CASSETTE_MODE == "record":
+        params["callbacks"] = [get_cassette_recorder()]
+    if temperature is not None:
+        params["temperature"] = temperature
+    # invoke_llm owns retries; the deadline bounds each request in the SDK itself
+    params["max_retries"] = 0
+    if CALL_DEADLINE:
+        params["timeout"] = CALL_DEADLINE
     try:
         if model_type == "groq":
-            return ChatGroq(model=model_name or "deepseek-r1-distill-qwen-32b")
+            params["http_client"] = shared_http_client()
+            params["http_async_client"] = shared_async_http_client()
+            if max_tokens:
+                params["max_tokens"] = max_tokens
+            return load_provider("groq")(model=model_name or "deepseek-r1-distill-qwen-32b", **params)
         elif model_type == "google":
-            return ChatGoogleGenerativeAI(model=model_name or "gemini-2.0-flash", temperature=0)
+            params.setdefault("temperature", 0)
+            if max_tokens:
+                params["max_output_tokens"] = max_tokens
+            return load_provider("google")(model=model_name or "gemini-2.0-flash", **params)
         elif model_type == "openai":
-            return ChatOpenAI(model_name=model_name or "gpt-4")
+            params["http_client"] = shared_http_client()
+            params["http_async_client"] = shared_async_http_client()
+            if max_tokens:
+                params["max_tokens"] = max_tokens
+            if OPENAI_BASE_URL:
+                params["base_url"] = OPENAI_BASE_URL
+            # Report token usage on streamed replies too
+            return load_provider("openai")(model_name=model_name or "gpt-4", stream_usage=True, **params)
         else:
             raise ValueError(f"Unsupported model type: {model_type}")
     except Exception as e:
+        # Raised rather than swapped for another model so the failover chain
+        # and its circuit breakers see the failure
         logger.error(f"Error initializing LLM {model_type}/{model_name}: {e}")
-        return ChatGroq(model="deepseek-r1-distill-qwen-32b")
+        raise
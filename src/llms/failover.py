@@ -0,0 +1,253 @@
+
+import os
+import time
+import logging
+import threading
+from collections import deque
+from src.llms.pool import llm_client, allm_client
+from src.llms.calls import invoke_llm, ainvoke_llm
+from src.llms.factory import has_credentials
+from src.llms.retry import RetryPolicy, DEFAULT_RETRY_POLICY, LLMCallCancelled
+
+logger = logging.getLogger(__name__)
+
+# Providers tried after a node's own model, e.g. "groq,openai:gpt-4o-mini";
+# fallbacks whose API key is not set are left out
+FAILOVER_CHAIN = os.getenv("LLM_FAILOVER_CHAIN", "")
+# Retries spent on a provider before moving down the chain (the last one uses the default policy)
+FAILOVER_RETRIES = int(os.getenv("LLM_FAILOVER_RETRIES", "1"))
+
+# Circuit breaker settings: trip when at least ERROR_RATE of the last WINDOW calls
+# (and at least MIN_CALLS) failed or took longer than SLOW_CALL_SECONDS
+BREAKER_ERROR_RATE = float(os.getenv("LLM_BREAKER_ERROR_RATE", "0.5"))
+BREAKER_SLOW_CALL_SECONDS = float(os.getenv("LLM_BREAKER_SLOW_CALL_SECONDS", "60"))
+BREAKER_WINDOW = int(os.getenv("LLM_BREAKER_WINDOW", "20"))
+BREAKER_MIN_CALLS = int(os.getenv("LLM_BREAKER_MIN_CALLS", "5"))
+BREAKER_COOLDOWN = float(os.getenv("LLM_BREAKER_COOLDOWN", "30"))
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class CircuitBreaker:
+    """Stops sending calls to a provider whose recent calls mostly failed or ran slow.
+
+    Once open, calls are refused until `cooldown` seconds have passed; the
+    breaker then lets a single probe call through (half-open) and closes
+    again if it succeeds.
+    """
+
+    def __init__(self, name, error_rate=BREAKER_ERROR_RATE, slow_call_seconds=BREAKER_SLOW_CALL_SECONDS,
+                 window=BREAKER_WINDOW, min_calls=BREAKER_MIN_CALLS, cooldown=BREAKER_COOLDOWN):
+        self.name = name
+        self.error_rate = error_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.min_calls = min_calls
+        self.cooldown = cooldown
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.probing = False
+        self.outcomes = deque(maxlen=window)
+        self.trips = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Whether a call may be sent now"""
+        with self._lock:
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.cooldown:
+                self.state = HALF_OPEN
+                logger.info(f"Circuit {self.name} half-open, sending a probe call")
+            if self.state == CLOSED or (self.state == HALF_OPEN and not self.probing):
+                self.probing = self.state == HALF_OPEN
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self, latency):
+        slow = latency > self.slow_call_seconds
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self.probing = False
+                if slow:
+                    self._open()
+                else:
+                    self.state = CLOSED
+                    self.outcomes.clear()
+                    logger.info(f"Circuit {self.name} closed")
+                return
+            self._record(slow)
+
+    def record_failure(self):
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self.probing = False
+                self._open()
+                return
+            self._record(True)
+
+    def record_cancelled(self):
+        """The call was abandoned before it finished; frees the probe without judging it"""
+        with self._lock:
+            self.probing = False
+
+    def _record(self, bad):
+        self.outcomes.append(bad)
+        if (self.state == CLOSED and len(self.outcomes) >= self.min_calls
+                and sum(self.outcomes) / len(self.outcomes) >= self.error_rate):
+            self._open()
+
+    def _open(self):
+        self.state = OPEN
+        self.opened_at = time.monotonic()
+        self.trips += 1
+        logger.warning(f"Circuit {self.name} open for {self.cooldown:.0f} seconds")
+
+    def stats(self):
+        with self._lock:
+            return {"state": self.state, "trips": self.trips, "rejected": self.rejected,
+                    "recent_calls": len(self.outcomes), "recent_failures": sum(self.outcomes)}
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(provider, model_name=None):
+    """Circuit breaker shared by every call to one provider/model"""
+    key = f"{provider}/{model_name or 'default'}"
+    with _breakers_lock:
+        if key not in _breakers:
+            _breakers[key] = CircuitBreaker(key)
+        return _breakers[key]
+
+
+def breaker_stats():
+    with _breakers_lock:
+        breakers = list(_breakers.items())
+    return {key: breaker.stats() for key, breaker in breakers}
+
+
+def parse_chain(spec):
+    """Parse "groq,openai:gpt-4o-mini" (or a list of such items) into
+    [("groq", None), ("openai", "gpt-4o-mini")]"""
+    items = (spec or "").split(",") if isinstance(spec, str) else spec
+    chain = []
+    for item in filter(None, (part.strip() for part in items)):
+        provider, _, model_name = item.partition(":")
+        chain.append((provider.strip(), model_name.strip() or None))
+    return chain
+
+
+def failover_chain(model_type, model_name, fallbacks=None):
+    """The node's own model followed by its fallbacks ("provider" or "provider:model" items)
+    that have credentials"""
+    fallbacks = parse_chain(FAILOVER_CHAIN if fallbacks is None else fallbacks)
+    return [(model_type, model_name)] + [
+        (provider, name) for provider, name in fallbacks
+        if (provider != model_type or name not in (None, model_name)) and has_credentials(provider)]
+
+
+def _policy_for(position, chain, policy):
+    if position == len(chain) - 1:
+        return policy
+    return RetryPolicy(max_retries=min(FAILOVER_RETRIES, policy.max_retries), base_delay=policy.base_delay,
+                       max_delay=policy.max_delay, deadline=policy.deadline, retryable=policy.retryable)
+
+
+def _skip(chain, position, breaker):
+    # The last provider is still tried when every breaker is open, so a
+    # degraded chain slows runs down instead of failing them outright
+    return not breaker.allow() and position < len(chain) - 1
+
+
+def _note_failover(metrics, provider, model_name, error):
+    logger.warning(f"LLM call to {provider}/{model_name or 'default'} failed ({type(error).__name__}: {error}), "
+                   f"failing over")
+    if metrics is not None:
+        metrics["failovers"] = metrics.get("failovers", 0) + 1
+
+
+def _chain_errors(errors):
+    """The first provider's error, with each later provider's error chained on as its cause"""
+    for error, later in zip(errors, errors[1:]):
+        error.__cause__ = later
+    return errors[0]
+
+
+def _note_provider(metrics, provider, model_name):
+    if metrics is not None:
+        metrics["provider"] = provider
+        metrics["model"] = model_name
+
+
+def invoke_with_failover(chain, messages, node_name=None, stream_callback=None,
+                         policy=DEFAULT_RETRY_POLICY, metrics=None, llm_kwargs=None, priority=None,
+                         stop_phrase=None, cancel=None):
+    """Call the first provider in `chain` whose circuit is closed, moving down the chain on failure.
+
+    `llm_kwargs` (temperature, max_tokens) apply to every model in the chain.
+    A call stopped through `cancel` (see invoke_llm) does not fail over.
+    """
+    errors = []
+    # Call records collect the provider time of the successful attempt even without `metrics`
+    metrics = {} if metrics is None else metrics
+    for position, (provider, model_name) in enumerate(chain):
+        breaker = get_breaker(provider, model_name)
+        if _skip(chain, position, breaker):
+            continue
+        try:
+            with llm_client(provider, model_name, **(llm_kwargs or {})) as llm:
+                response = invoke_llm(llm, messages, node_name, stream_callback=stream_callback,
+                                      provider=provider, policy=_policy_for(position, chain, policy),
+                                      metrics=metrics, priority=priority,
+                                      stop_phrase=stop_phrase, cancel=cancel)
+        except LLMCallCancelled:
+            breaker.record_cancelled()
+            raise
+        except Exception as e:
+            breaker.record_failure()
+            errors.append(e)
+            if position < len(chain) - 1:
+                _note_failover(metrics, provider, model_name, e)
+            continue
+        except BaseException:
+            breaker.record_cancelled()
+            raise
+        # Judged on the provider call itself, not the rate-limit and slot waits before it
+        breaker.record_success(metrics.get("provider_seconds", 0.0))
+        _note_provider(metrics, provider, model_name)
+        return response
+    raise _chain_errors(errors)
+
+
+async def ainvoke_with_failover(chain, messages, node_name=None, stream_callback=None,
+                                policy=DEFAULT_RETRY_POLICY, metrics=None, llm_kwargs=None,
+                                priority=None, stop_phrase=None):
+    """Async counterpart of invoke_with_failover"""
+    errors = []
+    # Call records collect the provider time of the successful attempt even without `metrics`
+    metrics = {} if metrics is None else metrics
+    for position, (provider, model_name) in enumerate(chain):
+        breaker = get_breaker(provider, model_name)
+        if _skip(chain, position, breaker):
+            continue
+        try:
+            async with allm_client(provider, model_name, **(llm_kwargs or {})) as llm:
+                response = await ainvoke_llm(llm, messages, node_name, stream_callback=stream_callback,
+                                             provider=provider, policy=_policy_for(position, chain, policy),
+                                             metrics=metrics, priority=priority,
+                                             stop_phrase=stop_phrase)
+        except Exception as e:
+            breaker.record_failure()
+            errors.append(e)
+            if position < len(chain) - 1:
+                _note_failover(metrics, provider, model_name, e)
+            continue
+        except BaseException:
+            breaker.record_cancelled()
+            raise
+        # Judged on the provider call itself, not the rate-limit and slot waits before it
+        breaker.record_success(metrics.get("provider_seconds", 0.0))
+        _note_provider(metrics, provider, model_name)
+        return response
+    raise _chain_errors(errors)
@@ -0,0 +1,186 @@
+
+import os
+import math
+import time
+import asyncio
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from src.llms.failover import invoke_with_failover, ainvoke_with_failover
+
+logger = logging.getLogger(__name__)
+
+# Hedging is opt-in: LLM_HEDGE_ENABLED=1, or "hedge": True in a run's configurable
+HEDGE_ENABLED = os.getenv("LLM_HEDGE_ENABLED", "0") == "1"
+# Send the hedge once a call has run longer than this percentile of the node's history
+HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "95"))
+# Calls a node must have made before it is hedged, and how many are remembered
+HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "10"))
+HEDGE_HISTORY = int(os.getenv("LLM_HEDGE_HISTORY", "200"))
+# "same" repeats the call on the node's chain, "alternate" starts at the next provider
+HEDGE_TARGET = os.getenv("LLM_HEDGE_TARGET", "same")
+
+_hedge_pool = ThreadPoolExecutor(
+    max_workers=int(os.getenv("LLM_HEDGE_WORKERS", "32")), thread_name_prefix="llm-hedge")
+
+
+class LatencyTracker:
+    """Recent call latencies and hedging counters per node"""
+
+    def __init__(self, history=HEDGE_HISTORY):
+        self.history = history
+        self._latencies = {}
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def record(self, node_name, latency, hedged=False, hedge_won=False):
+        with self._lock:
+            self._latencies.setdefault(node_name, deque(maxlen=self.history)).append(latency)
+            counts = self._counts.setdefault(node_name, {"calls": 0, "hedged": 0, "hedge_wins": 0})
+            counts["calls"] += 1
+            counts["hedged"] += hedged
+            counts["hedge_wins"] += hedge_won
+
+    def hedge_delay(self, node_name, pct=HEDGE_PERCENTILE, min_samples=HEDGE_MIN_SAMPLES):
+        """Seconds to wait before hedging a call, or None until there is enough history"""
+        with self._lock:
+            latencies = sorted(self._latencies.get(node_name, ()))
+        if len(latencies) < min_samples:
+            return None
+        rank = max(1, min(len(latencies), math.ceil(pct / 100 * len(latencies))))
+        return latencies[rank - 1]
+
+    def stats(self):
+        with self._lock:
+            counts = {node: dict(c) for node, c in self._counts.items()}
+        for c in counts.values():
+            c["hedge_rate"] = c["hedged"] / c["calls"] if c["calls"] else 0.0
+            c["win_rate"] = c["hedge_wins"] / c["hedged"] if c["hedged"] else 0.0
+        return counts
+
+
+latency_tracker = LatencyTracker()
+
+
+def hedge_stats():
+    return latency_tracker.stats()
+
+
+def hedge_chain(chain):
+    if HEDGE_TARGET == "alternate" and len(chain) > 1:
+        return chain[1:] + chain[:1]
+    return chain
+
+
+def _finish(metrics, winner_metrics, node_name, started, hedged, hedge_won):
+    latency = time.monotonic() - started
+    latency_tracker.record(node_name, latency, hedged, hedge_won)
+    if metrics is not None:
+        metrics.update(winner_metrics)
+        metrics["hedged"] = hedged
+        metrics["hedge_won"] = hedge_won
+
+
+def invoke_hedged(chain, messages, node_name=None, stream_callback=None, metrics=None, hedge=HEDGE_ENABLED,
+                  llm_kwargs=None, priority=None, stop_phrase=None):
+    """invoke_with_failover plus, when `hedge` is set, a second request once
+    the call runs past the node's usual latency.
+
+    The first successful response wins. The hedge does not stream to the
+    UI. Both calls of a hedged pair are read as streams so the loser can be
+    told to stop: it closes its stream at its next chunk and frees its
+    provider slot. Latencies are recorded either way so the history is
+    there when hedging is switched on.
+    """
+    started = time.monotonic()
+    delay = latency_tracker.hedge_delay(node_name) if hedge else None
+    options = {"llm_kwargs": llm_kwargs, "priority": priority, "stop_phrase": stop_phrase}
+    primary_metrics, hedge_metrics = {}, {}
+    if delay is None:
+        response = invoke_with_failover(chain, messages, node_name, stream_callback,
+                                        metrics=primary_metrics, **options)
+        _finish(metrics, primary_metrics, node_name, started, False, False)
+        return response
+
+    cancel_primary, cancel_hedge = threading.Event(), threading.Event()
+
+    def guarded(name, text):
+        if not cancel_primary.is_set():
+            stream_callback(name, text)
+
+    primary = _hedge_pool.submit(invoke_with_failover, chain, messages, node_name,
+                                 guarded if stream_callback else None, metrics=primary_metrics,
+                                 cancel=cancel_primary, **options)
+    try:
+        if wait([primary], timeout=delay).done:
+            response = primary.result()
+            _finish(metrics, primary_metrics, node_name, started, False, False)
+            return response
+
+        logger.info(f"Hedging {node_name} after {delay:.2f} seconds")
+        hedge_call = _hedge_pool.submit(invoke_with_failover, hedge_chain(chain), messages, node_name,
+                                        metrics=hedge_metrics, cancel=cancel_hedge, **options)
+        pending = {primary, hedge_call}
+        error = None
+        while pending:
+            finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                if future.exception() is not None:
+                    error = future.exception()
+                    continue
+                hedge_won = future is hedge_call
+                _finish(metrics, hedge_metrics if hedge_won else primary_metrics,
+                        node_name, started, True, hedge_won)
+                return future.result()
+        raise error
+    finally:
+        # Whichever call is still running lost (or its caller gave up)
+        cancel_primary.set()
+        cancel_hedge.set()
+
+
+async def ainvoke_hedged(chain, messages, node_name=None, stream_callback=None, metrics=None,
+                         hedge=HEDGE_ENABLED, llm_kwargs=None, priority=None, stop_phrase=None):
+    """Async counterpart of invoke_hedged; the losing call is cancelled"""
+    started = time.monotonic()
+    delay = latency_tracker.hedge_delay(node_name) if hedge else None
+    options = {"llm_kwargs": llm_kwargs, "priority": priority, "stop_phrase": stop_phrase}
+    primary_metrics, hedge_metrics = {}, {}
+    if delay is None:
+        response = await ainvoke_with_failover(chain, messages, node_name, stream_callback,
+                                               metrics=primary_metrics, **options)
+        _finish(metrics, primary_metrics, node_name, started, False, False)
+        return response
+
+    primary = asyncio.ensure_future(ainvoke_with_failover(chain, messages, node_name, stream_callback,
+                                                          metrics=primary_metrics, **options))
+    tasks = {primary}
+    try:
+        finished, _ = await asyncio.wait(tasks, timeout=delay)
+        if finished:
+            response = primary.result()
+            _finish(metrics, primary_metrics, node_name, started, False, False)
+            return response
+
+        logger.info(f"Hedging {node_name} after {delay:.2f} seconds")
+        hedge_call = asyncio.ensure_future(ainvoke_with_failover(hedge_chain(chain), messages, node_name,
+                                                                 metrics=hedge_metrics, **options))
+        tasks.add(hedge_call)
+        pending = set(tasks)
+        error = None
+        while pending:
+            finished, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in finished:
+                if task.exception() is not None:
+                    error = task.exception()
+                    continue
+                hedge_won = task is hedge_call
+                _finish(metrics, hedge_metrics if hedge_won else primary_metrics,
+                        node_name, started, True, hedge_won)
+                return task.result()
+        raise error
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
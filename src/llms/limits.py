@@ -0,0 +1,326 @@
+
+import os
+import time
+import asyncio
+import logging
+import heapq
+import itertools
+import threading
+from contextlib import contextmanager, asynccontextmanager
+
+logger = logging.getLogger(__name__)
+
+
+# Lower levels are served first when calls queue for a provider slot
+PRIORITY_LEVELS = {"interactive": 0, "batch": 10}
+DEFAULT_PRIORITY = os.getenv("LLM_DEFAULT_PRIORITY", "interactive")
+
+
+def priority_level(priority=None):
+    """Numeric level for a priority name ("interactive", "batch") or number"""
+    if priority is None:
+        priority = DEFAULT_PRIORITY
+    if isinstance(priority, str):
+        return PRIORITY_LEVELS[priority] if priority in PRIORITY_LEVELS else int(priority)
+    return int(priority)
+
+
+def priority_name(level):
+    for name, value in PRIORITY_LEVELS.items():
+        if value == level:
+            return name
+    return str(level)
+
+
+class _Waiter:
+    """A thread or task queued for a limiter slot"""
+
+    def __init__(self, wake, level, seq):
+        self.wake = wake
+        self.level = level
+        self.seq = seq
+        self.granted = False
+
+    def __lt__(self, other):
+        return (self.level, self.seq) < (other.level, other.seq)
+
+
+class ConcurrencyLimiter:
+    """Caps the number of in-flight calls; usable from threads and asyncio tasks.
+
+    Slots are handed to waiters on release by priority level (interactive
+    before batch) and in arrival order within a level, so a waiting thread
+    or task cannot be starved by newcomers of its own level.
+    """
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.active = 0
+        self._lock = threading.Lock()
+        self._waiters = []
+        self._seq = itertools.count()
+        self._waits = {}
+
+    def _enqueue(self, wake, level):
+        """Take a free slot, or queue a waiter and return it"""
+        with self._lock:
+            if self.active < self.limit and not self._waiters:
+                self.active += 1
+                return None
+            waiter = _Waiter(wake, level, next(self._seq))
+            heapq.heappush(self._waiters, waiter)
+            return waiter
+
+    def _record_wait(self, level, waited):
+        with self._lock:
+            stats = self._waits.setdefault(level, {"acquired": 0, "total_wait": 0.0, "max_wait": 0.0})
+            stats["acquired"] += 1
+            stats["total_wait"] += waited
+            stats["max_wait"] = max(stats["max_wait"], waited)
+
+    def acquire(self, priority=None):
+        level = priority_level(priority)
+        started = time.monotonic()
+        event = threading.Event()
+        if self._enqueue(event.set, level) is not None:
+            event.wait()
+        self._record_wait(level, time.monotonic() - started)
+
+    async def aacquire(self, priority=None):
+        level = priority_level(priority)
+        started = time.monotonic()
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def wake():
+            loop.call_soon_threadsafe(
+                lambda: future.done() or future.set_result(None))
+
+        waiter = self._enqueue(wake, level)
+        if waiter is not None:
+            try:
+                await future
+            except asyncio.CancelledError:
+                with self._lock:
+                    if not waiter.granted:
+                        self._waiters.remove(waiter)
+                        heapq.heapify(self._waiters)
+                        raise
+                # The slot was handed over while we were being cancelled
+                self.release()
+                raise
+        self._record_wait(level, time.monotonic() - started)
+
+    def release(self):
+        with self._lock:
+            if self._waiters:
+                # Hand the slot straight to the most urgent waiter
+                waiter = heapq.heappop(self._waiters)
+                waiter.granted = True
+            else:
+                self.active -= 1
+                return
+        waiter.wake()
+
+    def stats(self):
+        """Slot usage, queue depth per priority and how long each priority waited"""
+        with self._lock:
+            queued = {}
+            for waiter in self._waiters:
+                name = priority_name(waiter.level)
+                queued[name] = queued.get(name, 0) + 1
+            waits = {
+                priority_name(level): {
+                    "acquired": w["acquired"],
+                    "avg_wait_seconds": w["total_wait"] / w["acquired"] if w["acquired"] else 0.0,
+                    "max_wait_seconds": w["max_wait"],
+                }
+                for level, w in self._waits.items()
+            }
+            return {"limit": self.limit, "active": self.active,
+                    "waiting": len(self._waiters), "waiting_by_priority": queued, "waits": waits}
+
+
+def parse_limits(spec):
+    """Parse "google=4,groq=2" into {"google": 4, "groq": 2}"""
+    limits = {}
+    for item in filter(None, (part.strip() for part in (spec or "").split(","))):
+        provider, _, value = item.partition("=")
+        limits[provider.strip()] = int(value)
+    return limits
+
+
+# Per-provider caps on concurrent LLM calls, e.g. LLM_PROVIDER_CONCURRENCY="google=4,groq=2"
+_provider_limiters = {
+    provider: ConcurrencyLimiter(limit)
+    for provider, limit in parse_limits(os.getenv("LLM_PROVIDER_CONCURRENCY")).items()
+}
+
+
+def set_provider_concurrency(provider, limit):
+    """Cap concurrent calls to `provider` across the process (None removes the cap)"""
+    if limit is None:
+        _provider_limiters.pop(provider, None)
+    else:
+        _provider_limiters[provider] = ConcurrencyLimiter(limit)
+    logger.info(f"Provider {provider} concurrency limit: {limit}")
+
+
+def provider_limiter_stats():
+    return {provider: limiter.stats() for provider, limiter in _provider_limiters.items()}
+
+
+@contextmanager
+def provider_slot(provider, priority=None):
+    limiter = _provider_limiters.get(provider)
+    if limiter is None:
+        yield
+        return
+    limiter.acquire(priority)
+    try:
+        yield
+    finally:
+        limiter.release()
+
+
+@asynccontextmanager
+async def aprovider_slot(provider, priority=None):
+    limiter = _provider_limiters.get(provider)
+    if limiter is None:
+        yield
+        return
+    await limiter.aacquire(priority)
+    try:
+        yield
+    finally:
+        limiter.release()
+
+
+class TokenBucket:
+    """Refills at `per_minute` units per minute up to one minute of burst.
+
+    Callers reserve units up front and the balance may go negative; the
+    reservation then tells the caller how long to wait, which keeps callers
+    in arrival order without a background thread.
+    """
+
+    def __init__(self, per_minute):
+        self.rate = per_minute / 60.0
+        self.capacity = float(per_minute)
+        self.tokens = float(per_minute)
+        self.updated = time.monotonic()
+
+    def reserve(self, amount, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= min(amount, self.capacity)
+        return max(0.0, -self.tokens / self.rate)
+
+
+class RateLimiter:
+    """Client-side requests/min and tokens/min limits for one provider"""
+
+    def __init__(self, requests_per_minute=None, tokens_per_minute=None):
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.waited_calls = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def reserve(self, tokens):
+        """Reserve capacity for one call and return the seconds to wait before sending it"""
+        with self._lock:
+            now = time.monotonic()
+            wait = 0.0
+            if self.requests:
+                wait = max(wait, self.requests.reserve(1, now))
+            if self.tokens:
+                wait = max(wait, self.tokens.reserve(tokens, now))
+            self.calls += 1
+            if wait > 0:
+                self.waited_calls += 1
+                self.total_wait += wait
+                self.max_wait = max(self.max_wait, wait)
+            return wait
+
+    def acquire(self, tokens=0):
+        wait = self.reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    async def aacquire(self, tokens=0):
+        wait = self.reserve(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+    def stats(self):
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "waited_calls": self.waited_calls,
+                "total_wait_seconds": self.total_wait,
+                "avg_wait_seconds": self.total_wait / self.calls if self.calls else 0.0,
+                "max_wait_seconds": self.max_wait,
+            }
+
+
+def parse_rate_limits(spec):
+    """Parse "google=15/1000000,groq=30/6000" (requests/min / tokens/min) into a dict"""
+    limits = {}
+    for item in filter(None, (part.strip() for part in (spec or "").split(","))):
+        provider, _, value = item.partition("=")
+        rpm, _, tpm = value.partition("/")
+        limits[provider.strip()] = (int(rpm) if rpm else None, int(tpm) if tpm else None)
+    return limits
+
+
+# Per-provider rate limits, e.g. LLM_RATE_LIMITS="google=15/1000000,groq=30/6000"
+_provider_rate_limiters = {
+    provider: RateLimiter(rpm, tpm)
+    for provider, (rpm, tpm) in parse_rate_limits(os.getenv("LLM_RATE_LIMITS")).items()
+}
+
+
+def set_provider_rate_limit(provider, requests_per_minute=None, tokens_per_minute=None):
+    """Limit calls to `provider` across the process (no limits removes the limiter)"""
+    if not requests_per_minute and not tokens_per_minute:
+        _provider_rate_limiters.pop(provider, None)
+    else:
+        _provider_rate_limiters[provider] = RateLimiter(requests_per_minute, tokens_per_minute)
+    logger.info(
+        f"Provider {provider} rate limit: {requests_per_minute} requests/min, {tokens_per_minute} tokens/min")
+
+
+def provider_rate_limiter_stats():
+    return {provider: limiter.stats() for provider, limiter in _provider_rate_limiters.items()}
+
+
+def estimate_tokens(messages):
+    """Rough prompt size in tokens (about four characters per token)"""
+    return sum(len(str(message.content)) for message in messages) // 4 + 1
+
+
+def wait_for_rate_limit(provider, messages):
+    """Block until `provider` has capacity for this prompt; returns the seconds waited"""
+    limiter = _provider_rate_limiters.get(provider)
+    if limiter is None:
+        return 0.0
+    wait = limiter.acquire(estimate_tokens(messages))
+    if wait > 0:
+        logger.info(f"Rate limited by {provider} for {wait:.2f} seconds")
+    return wait
+
+
+async def await_rate_limit(provider, messages):
+    """Async counterpart of wait_for_rate_limit"""
+    limiter = _provider_rate_limiters.get(provider)
+    if limiter is None:
+        return 0.0
+    wait = await limiter.aacquire(estimate_tokens(messages))
+    if wait > 0:
+        logger.info(f"Rate limited by {provider} for {wait:.2f} seconds")
+    return wait
@@ -0,0 +1,216 @@
+
+import os
+import time
+import asyncio
+import logging
+import threading
+from collections import deque
+from contextlib import contextmanager, asynccontextmanager
+from src.llms import factory
+
+logger = logging.getLogger(__name__)
+
+# Clients kept per provider/model/params; calls beyond this wait for a free client.
+# 0 (the default) builds one per concurrent call, which the provider
+# concurrency limits (src/llms/limits.py) already bound
+CLIENT_POOL_SIZE = int(os.getenv("LLM_CLIENT_POOL_SIZE", "0"))
+# Clients created per routed model by warm_up_clients()
+CLIENT_WARM_UP = int(os.getenv("LLM_CLIENT_WARM_UP", "1"))
+
+
+class ClientPool:
+    """Pool of chat model clients for one provider/model/params.
+
+    Clients are built on demand up to `size` (unbounded when 0); a failed
+    build is raised to the caller and nothing is kept, so a bad
+    configuration is retried on the next checkout instead of being cached.
+    Threads wait on a condition and coroutines on a future of their own
+    loop, and a released client goes to the oldest waiting coroutine first.
+    """
+
+    def __init__(self, key, create, size=CLIENT_POOL_SIZE):
+        self.key = key
+        self.create = create
+        self.size = size or None
+        self.idle = []
+        self._async_waiters = deque()
+        self.created = 0
+        self.in_use = 0
+        self.waiting = 0
+        self.checkouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self._cond = threading.Condition()
+
+    def _take(self):
+        """An idle client, True when the caller may build a new one, or None to wait"""
+        if self.idle:
+            return self.idle.pop()
+        if self.size is None or self.created < self.size:
+            self.created += 1
+            return True
+        return None
+
+    def _build(self):
+        try:
+            return self.create()
+        except Exception:
+            with self._cond:
+                self.created -= 1
+                self.in_use -= 1
+                self._wake()
+            raise
+
+    def _checked_out(self, started):
+        waited = time.monotonic() - started
+        self.in_use += 1
+        self.checkouts += 1
+        self.total_wait += waited
+        self.max_wait = max(self.max_wait, waited)
+
+    def acquire(self):
+        started = time.monotonic()
+        with self._cond:
+            client = self._take()
+            if client is None:
+                self.waiting += 1
+                while client is None:
+                    self._cond.wait()
+                    client = self._take()
+                self.waiting -= 1
+            self._checked_out(started)
+        return self._build() if client is True else client
+
+    async def aacquire(self):
+        started = time.monotonic()
+        with self._cond:
+            client = self._take()
+            if client is None:
+                loop = asyncio.get_running_loop()
+                waiter = (loop, loop.create_future(), started)
+                self._async_waiters.append(waiter)
+                self.waiting += 1
+            else:
+                self._checked_out(started)
+        if client is None:
+            try:
+                client = await waiter[1]
+            except asyncio.CancelledError:
+                with self._cond:
+                    if waiter in self._async_waiters:
+                        self._async_waiters.remove(waiter)
+                        self.waiting -= 1
+                if waiter[1].done() and not waiter[1].cancelled():
+                    # Handed a client just as we were cancelled
+                    self._give_back(waiter[1].result())
+                raise
+        return self._build() if client is True else client
+
+    def _wake(self):
+        """Hand free clients to waiting coroutines, then wake a waiting thread; called under the lock"""
+        while self._async_waiters and (self.idle or self.size is None or self.created < self.size):
+            loop, future, started = self._async_waiters.popleft()
+            self.waiting -= 1
+            client = self._take()
+            self._checked_out(started)
+            loop.call_soon_threadsafe(self._deliver, future, client)
+        self._cond.notify()
+
+    def _deliver(self, future, client):
+        if future.cancelled():
+            self._give_back(client)
+        else:
+            future.set_result(client)
+
+    def _give_back(self, client):
+        """Return a client (or a build slot) that was checked out but never used"""
+        if client is True:
+            with self._cond:
+                self.created -= 1
+                self.in_use -= 1
+                self._wake()
+        else:
+            self.release(client)
+
+    def release(self, client):
+        with self._cond:
+            self.in_use -= 1
+            self.idle.append(client)
+            self._wake()
+
+    def warm(self, count):
+        """Build clients up front so the first calls do not pay for it"""
+        clients = [self.acquire() for _ in range(min(count, self.size or count))]
+        for client in clients:
+            self.release(client)
+
+    def stats(self):
+        with self._cond:
+            return {
+                "size": self.size, "created": self.created, "in_use": self.in_use,
+                "idle": len(self.idle), "waiting": self.waiting, "checkouts": self.checkouts,
+                "avg_wait_seconds": self.total_wait / self.checkouts if self.checkouts else 0.0,
+                "max_wait_seconds": self.max_wait,
+            }
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_client_pool(model_type, model_name=None, temperature=None, max_tokens=None):
+    key = (model_type, model_name, temperature, max_tokens)
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = ClientPool(
+                "/".join(str(part) for part in key if part is not None),
+                lambda: factory.get_llm(model_type, model_name, temperature, max_tokens))
+        return _pools[key]
+
+
+@contextmanager
+def llm_client(model_type, model_name=None, temperature=None, max_tokens=None):
+    """Check a client out of its pool for the duration of one call"""
+    pool = get_client_pool(model_type, model_name, temperature, max_tokens)
+    client = pool.acquire()
+    try:
+        yield client
+    finally:
+        pool.release(client)
+
+
+@asynccontextmanager
+async def allm_client(model_type, model_name=None, temperature=None, max_tokens=None):
+    pool = get_client_pool(model_type, model_name, temperature, max_tokens)
+    client = await pool.aacquire()
+    try:
+        yield client
+    finally:
+        pool.release(client)
+
+
+def client_pool_stats():
+    with _pools_lock:
+        pools = list(_pools.values())
+    return {pool.key: pool.stats() for pool in pools}
+
+
+def warm_up_clients(count=CLIENT_WARM_UP):
+    """Build clients for every model in the routing table; failures are logged, not raised"""
+    from src.llms.routing import load_routing, resolve_route
+
+    table = load_routing()
+    defaults = {"provider": "google", "model": "gemini-2.0-flash", "fallbacks": None}
+    targets = set()
+    for node_name in list(table.get("nodes", {})) or ["default"]:
+        route = resolve_route(node_name, defaults)
+        # Only the node's own model; fallbacks are built when first needed
+        targets.add((route["provider"], route["model"], route.get("temperature"), route.get("max_tokens")))
+
+    started = time.monotonic()
+    for target in sorted(targets, key=str):
+        try:
+            get_client_pool(*target).warm(count)
+        except Exception as e:
+            logger.warning(f"Could not warm up LLM client {target}: {e}")
+    logger.info(f"Warmed up {len(targets)} LLM client pools in {time.monotonic() - started:.2f} seconds")
@@ -0,0 +1,100 @@
+
+import os
+import time
+import random
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Retries after the first attempt of an LLM call
+MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+# Backoff before retry n is a random delay up to min(MAX, BASE * 2**n) seconds
+RETRY_BASE_DELAY = float(os.getenv("LLM_RETRY_BASE_DELAY", "1.0"))
+RETRY_MAX_DELAY = float(os.getenv("LLM_RETRY_MAX_DELAY", "30.0"))
+# Seconds one attempt may take before it is abandoned (0 disables the deadline);
+# also the request timeout of the provider clients
+CALL_DEADLINE = float(os.getenv("LLM_CALL_DEADLINE", "180"))
+
+# Errors matched by class name so provider SDKs need not be imported;
+# extend with LLM_RETRYABLE_ERRORS="BadGateway,SomeOtherError"
+RETRYABLE_ERRORS = {
+    "TimeoutError", "ConnectionError",
+    "RateLimitError", "APIConnectionError", "APITimeoutError", "InternalServerError",
+    "ResourceExhausted", "ServiceUnavailable", "DeadlineExceeded", "ServerError",
+    "ConnectError", "ReadTimeout", "RemoteProtocolError",
+    # langchain_core's provider-neutral errors, e.g. Gemini's 429 (GoogleRateLimitError)
+    "ModelRateLimitError", "ModelAPIError", "ModelConnectionError", "ModelTimeoutError",
+} | set(filter(None, (name.strip() for name in os.getenv("LLM_RETRYABLE_ERRORS", "").split(","))))
+
+# HTTP statuses worth retrying when an error carries one
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+
+
+class LLMCallTimeout(TimeoutError):
+    """An LLM call attempt ran past its deadline"""
+
+
+class LLMCallCancelled(Exception):
+    """An LLM call was told to stop, e.g. the losing half of a hedged pair; never retried"""
+
+
+class RetryPolicy:
+    """Bounded retries with exponential backoff, full jitter and a per-attempt deadline"""
+
+    def __init__(self, max_retries=MAX_RETRIES, base_delay=RETRY_BASE_DELAY,
+                 max_delay=RETRY_MAX_DELAY, deadline=CALL_DEADLINE, retryable=None):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline or None
+        self.retryable = set(RETRYABLE_ERRORS if retryable is None else retryable)
+
+    def is_retryable(self, error):
+        """Whether `error`, or an error it was raised from, is transient"""
+        seen = set()
+        while error is not None and id(error) not in seen:
+            seen.add(id(error))
+            if any(cls.__name__ in self.retryable for cls in type(error).__mro__):
+                return True
+            # Wrapped SDK errors (e.g. google.genai's ClientError) carry the HTTP status
+            status = getattr(error, "status_code", None) or getattr(error, "code", None)
+            if status in RETRYABLE_STATUS_CODES:
+                return True
+            error = error.__cause__
+        return False
+
+    def backoff(self, retry):
+        """Seconds to sleep before retry number `retry` (0-based)"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** retry))
+
+
+DEFAULT_RETRY_POLICY = RetryPolicy()
+
+
+class Deadline:
+    """Wall-clock budget of one sync attempt, counted from its creation.
+
+    Sync attempts run on the caller's thread: a plain call is bounded by the
+    client's request timeout (get_llm), and a stream calls check() between
+    chunks so it is closed once the budget is spent.
+    """
+
+    def __init__(self, seconds):
+        self.seconds = seconds or None
+        self.expires = time.monotonic() + self.seconds if self.seconds else None
+
+    def check(self):
+        if self.expires is not None and time.monotonic() > self.expires:
+            raise LLMCallTimeout(f"LLM call exceeded its {self.seconds:.0f}s deadline")
+
+
+async def acall_with_deadline(coro_fn, deadline):
+    """Await `coro_fn()`, cancelling it and raising LLMCallTimeout once it runs
+    past `deadline` seconds (no limit when falsy)"""
+    if not deadline:
+        return await coro_fn()
+    try:
+        return await asyncio.wait_for(coro_fn(), timeout=deadline)
+    except asyncio.TimeoutError:
+        raise LLMCallTimeout(f"LLM call exceeded its {deadline:.0f}s deadline") from None
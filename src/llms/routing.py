@@ -0,0 +1,42 @@
+
+import os
+import json
+import logging
+from functools import lru_cache
+
+logger = logging.getLogger(__name__)
+
+# Node name -> provider/model/temperature/max_tokens/fallbacks
+ROUTING_PATH = os.getenv("LLM_ROUTING_PATH", os.path.join(os.path.dirname(__file__), "routing.json"))
+
+ROUTE_KEYS = ("provider", "model", "temperature", "max_tokens", "fallbacks")
+
+
+@lru_cache(maxsize=4)
+def load_routing(path=ROUTING_PATH):
+    """Read the routing table; a missing file means every node keeps its own model"""
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        logger.warning(f"Routing table {path} not found, using node defaults")
+        return {}
+
+
+def resolve_route(node_name, defaults, overrides=None, path=ROUTING_PATH):
+    """Model settings for one node call.
+
+    Later sources win: the node's own `defaults`, the table's "default"
+    entry, the table's entry for the node, then the per-run `overrides`
+    ({node_name: {...}} or {"default": {...}}).
+    """
+    table = load_routing(path)
+    overrides = overrides or {}
+    route = dict(defaults)
+    for entry in (table.get("default"), table.get("nodes", {}).get(node_name),
+                  overrides.get("default"), overrides.get(node_name)):
+        for key, value in (entry or {}).items():
+            if key not in ROUTE_KEYS:
+                raise ValueError(f"Unknown routing key {key!r} for node {node_name}")
+            route[key] = value
+    return route
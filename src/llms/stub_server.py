@@ -0,0 +1,259 @@
+
+"""OpenAI-compatible stub LLM server for load tests.
+
+    python -m src.llms.stub_server --port 8800 --latency lognormal:0.8,0.5 \\
+        --tokens-per-second 60 --error-rate 0.02 --rate-limit-rate 0.05 --approve-every 3
+
+Point the openai provider at it with OPENAI_BASE_URL=http://127.0.0.1:8800/v1
+and OPENAI_API_KEY=stub, and route the nodes to openai (see README).
+"""
+
+import re
+import json
+import math
+import hashlib
+import time
+import uuid
+import random
+import logging
+import sys
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from src.state.state import APPROVED_PHRASES
+
+logger = logging.getLogger(__name__)
+
+# The requirement quoted in a verdict prompt, ending where the prompt moves on
+REQUIREMENT = re.compile(r"requirement:\s+(.*?)(?:, user stories:|\. if )", re.DOTALL)
+
+FILLER = ("The implementation follows the design and covers the main scenarios "
+          "with validation, error handling and logging in place").split()
+
+
+def parse_latency(spec):
+    """Sampler for "fixed:0.5", "uniform:0.2,1.5", "lognormal:MEDIAN,SIGMA" or "exp:MEAN" (seconds)"""
+    kind, _, args = (spec or "fixed:0").partition(":")
+    values = [float(v) for v in args.split(",") if v]
+    if kind == "fixed":
+        return lambda: values[0]
+    if kind == "uniform":
+        return lambda: random.uniform(values[0], values[1])
+    if kind == "lognormal":
+        return lambda: random.lognormvariate(math.log(values[0]), values[1])
+    if kind == "exp":
+        return lambda: random.expovariate(1 / values[0])
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+
+class StubBehaviour:
+    """Latency, failure injection and scripted verdicts shared by all requests"""
+
+    def __init__(self, latency="fixed:0", tokens_per_second=0, output_tokens=200, error_rate=0.0,
+                 rate_limit_rate=0.0, approve_every=1, approval_padding=0):
+        self.latency = parse_latency(latency)
+        self.tokens_per_second = tokens_per_second
+        self.output_tokens = output_tokens
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.approve_every = max(1, approve_every)
+        self.approval_padding = approval_padding
+        self.verdicts = {}
+        self.counts = {"requests": 0, "errors": 0, "rate_limited": 0, "approvals": 0}
+        self._lock = threading.Lock()
+
+    def count(self, key):
+        with self._lock:
+            self.counts[key] += 1
+
+    def failure(self):
+        """HTTP status to fail this request with, or None"""
+        roll = random.random()
+        if roll < self.rate_limit_rate:
+            self.count("rate_limited")
+            return 429
+        if roll < self.rate_limit_rate + self.error_rate:
+            self.count("errors")
+            return 500
+        return None
+
+    def reply(self, messages):
+        """Reply text: verdict prompts are approved on every `approve_every`-th request,
+        followed by `approval_padding` tokens of commentary.
+
+        Verdicts are counted per requirement and phrase, so concurrent runs of
+        different requirements each see their own review loop.
+        """
+        prompt = " ".join(str(m.get("content", "")) for m in messages).lower()
+        for phrase in sorted(APPROVED_PHRASES.values(), key=len, reverse=True):
+            if f"'{phrase}" in prompt:
+                key = (self._requirement_digest(prompt), phrase)
+                with self._lock:
+                    self.verdicts[key] = self.verdicts.get(key, 0) + 1
+                    approve = self.verdicts[key] % self.approve_every == 0
+                    self.counts["approvals"] += approve
+                if approve:
+                    if self.approval_padding:
+                        return f"{phrase.capitalize()}. " + self._filler(self.approval_padding)
+                    return phrase.capitalize()
+                return "Please address these comments: " + self._filler(self.output_tokens // 4)
+        return self._filler(self.output_tokens)
+
+    @staticmethod
+    def _requirement_digest(prompt):
+        match = REQUIREMENT.search(prompt)
+        return hashlib.sha256(match.group(1).strip().encode("utf-8")).hexdigest()[:16] if match else ""
+
+    @staticmethod
+    def _filler(words):
+        return " ".join(FILLER[i % len(FILLER)] for i in range(max(1, words)))
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+    def _send_json(self, status, body, headers=None):
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        behaviour = self.server.behaviour
+        if self.path.rstrip("/").endswith("/models"):
+            self._send_json(200, {"object": "list", "data": [{"id": "stub", "object": "model"}]})
+        elif self.path.rstrip("/").endswith("/stats"):
+            self._send_json(200, dict(behaviour.counts))
+        else:
+            self._send_json(404, {"error": {"message": "not found"}})
+
+    def do_POST(self):
+        behaviour = self.server.behaviour
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": "not found"}})
+            return
+        behaviour.count("requests")
+
+        status = behaviour.failure()
+        if status == 429:
+            self._send_json(429, {"error": {"message": "Rate limit reached", "type": "rate_limit_error",
+                                            "code": "rate_limit_exceeded"}}, {"Retry-After": "1"})
+            return
+        if status:
+            self._send_json(500, {"error": {"message": "Injected server error", "type": "server_error"}})
+            return
+
+        time.sleep(behaviour.latency())
+        messages = body.get("messages", [])
+        text = behaviour.reply(messages)
+        words = text.split(" ")
+        usage = {
+            "prompt_tokens": sum(len(str(m.get("content", ""))) for m in messages) // 4 + 1,
+            "completion_tokens": len(words),
+        }
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        model = body.get("model", "stub")
+        if body.get("stream"):
+            self._stream(completion_id, model, words, usage, body.get("stream_options") or {})
+            return
+
+        if behaviour.tokens_per_second:
+            time.sleep(len(words) / behaviour.tokens_per_second)
+        self._send_json(200, {
+            "id": completion_id, "object": "chat.completion", "created": int(time.time()), "model": model,
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": text}}],
+            "usage": usage,
+        })
+
+    def _stream(self, completion_id, model, words, usage, stream_options):
+        behaviour = self.server.behaviour
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        def event(choices, extra=None):
+            chunk = {"id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()),
+                     "model": model, "choices": choices, **(extra or {})}
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+
+        try:
+            event([{"index": 0, "delta": {"role": "assistant", "content": ""}, "finish_reason": None}])
+            for index, word in enumerate(words):
+                if behaviour.tokens_per_second:
+                    time.sleep(1 / behaviour.tokens_per_second)
+                piece = word if index == len(words) - 1 else word + " "
+                event([{"index": 0, "delta": {"content": piece}, "finish_reason": None}])
+            event([{"index": 0, "delta": {}, "finish_reason": "stop"}])
+            if stream_options.get("include_usage"):
+                event([], {"usage": usage})
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            # The client stopped reading (cancelled or early-stopped call)
+            pass
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients drop idle keep-alive connections all the time under load
+        if isinstance(sys.exc_info()[1], (ConnectionResetError, BrokenPipeError)):
+            return
+        super().handle_error(request, client_address)
+
+
+def make_server(host="127.0.0.1", port=8800, **behaviour):
+    """Build the stub server; call serve_forever() (or run it in a thread) to start it"""
+    server = StubServer((host, port), StubHandler)
+    server.behaviour = StubBehaviour(**behaviour)
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="OpenAI-compatible stub LLM server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8800)
+    parser.add_argument("--latency", default="fixed:0",
+                        help="time to first token: fixed:S, uniform:A,B, lognormal:MEDIAN,SIGMA or exp:MEAN")
+    parser.add_argument("--tokens-per-second", type=float, default=0,
+                        help="output token rate, 0 for instant (default: %(default)s)")
+    parser.add_argument("--output-tokens", type=int, default=200,
+                        help="length of generated replies in tokens (default: %(default)s)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests failing with 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="fraction of requests failing with 429")
+    parser.add_argument("--approve-every", type=int, default=1,
+                        help="approve every Nth review of each kind (default: %(default)s)")
+    parser.add_argument("--approval-padding", type=int, default=0,
+                        help="tokens of commentary after an approval (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    server = make_server(args.host, args.port, latency=args.latency, tokens_per_second=args.tokens_per_second,
+                         output_tokens=args.output_tokens, error_rate=args.error_rate,
+                         rate_limit_rate=args.rate_limit_rate, approve_every=args.approve_every,
+                         approval_padding=args.approval_padding)
+    print(f"Stub LLM server on http://{args.host}:{args.port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
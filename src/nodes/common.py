@@ -1,7 +1,14 @@
 
 import time
+import inspect
 import logging
 from contextlib import contextmanager
+from langchain_core.messages import AIMessage
+from src.llms.failover import failover_chain
+from src.llms.routing import resolve_route
+from src.llms.calls import EARLY_STOP, token_usage
+from src.llms.hedging import HEDGE_ENABLED, invoke_hedged, ainvoke_hedged
+from src.nodes.memo import MEMOIZE, memo_key
 
 logger = logging.getLogger(__name__)
 
@@ -31,10 +38,172 @@ def extract_content_after_pattern(text):
     return text[position + len(pattern):]
 
 
+def get_configurable(config, key, default=None):
+    """Read a per-run option from the `configurable` section of a run config"""
+    if not config:
+        return default
+    return config.get("configurable", {}).get(key, default)
+
+
+def accepts_config(fn):
+    return "config" in inspect.signature(fn).parameters
+
+
+class LLMNode:
+    """Workflow node backed by a single LLM call.
+
+    `prompt(state)` builds the message list and `result(state, content)` maps
+    the reply onto a state update plus the text recorded in the chat trace.
+    Calling the node runs it synchronously; `ainvoke` is the async variant
+    used when the graph is driven by `ainvoke`. When the run config carries a
+    `stream_callback` the reply is streamed to it token by token. The model
+    comes from the routing table (src/llms/routing.json, per-run overrides
+    under the config's `routing`); calls fail over down the route's
+    `fallbacks` (see src/llms/failover.py) and are hedged when the config
+    sets `hedge`. Verdict nodes pass their approval phrase as `stop_phrase`
+    so the reply ends once the verdict is in (config `early_stop`).
+    `reads` lists the state fields the prompt is built from; with a `memo`
+    (see with_memo) a node seeing the same fields and model settings again
+    reuses its earlier reply instead of calling the model.
+    """
+
+    def __init__(self, name, description, prompt, result,
+                 model_type="google", model_name="gemini-2.0-flash", fallbacks=None, stop_phrase=None,
+                 reads=None):
+        self.name = name
+        self.description = description
+        self.prompt = prompt
+        self.result = result
+        self.model_type = model_type
+        self.model_name = model_name
+        self.fallbacks = fallbacks
+        self.stop_phrase = stop_phrase
+        self.reads = reads
+
+    def route(self, config=None):
+        defaults = {"provider": self.model_type, "model": self.model_name, "fallbacks": self.fallbacks}
+        return resolve_route(self.name, defaults, get_configurable(config, "routing"))
+
+    def __call__(self, state, config=None, memo=None):
+        messages = self.prompt(state)
+        key = self._memo_key(state, config) if memo is not None else None
+        entry = memo.get(self.name, key) if key else None
+        if entry is not None:
+            return self._update(state, messages, entry["content"], self._memo_call(config))
+        call, options = self._call_options(config)
+        with timer(self.description):
+            response = invoke_hedged(messages=messages, node_name=self.name, metrics=call, **options)
+            content = response.content.strip()
+        call.update(token_usage(response))
+        return self._remember(memo, key, content, self._update(state, messages, content, call))
+
+    async def ainvoke(self, state, config=None, memo=None):
+        messages = self.prompt(state)
+        key = self._memo_key(state, config) if memo is not None else None
+        entry = memo.get(self.name, key) if key else None
+        if entry is not None:
+            return self._update(state, messages, entry["content"], self._memo_call(config))
+        call, options = self._call_options(config)
+        with timer(self.description):
+            response = await ainvoke_hedged(messages=messages, node_name=self.name, metrics=call, **options)
+            content = response.content.strip()
+        call.update(token_usage(response))
+        return self._remember(memo, key, content, self._update(state, messages, content, call))
+
+    def _memo_key(self, state, config):
+        """Hash of the fields this node reads plus everything that shapes its reply, or None without `reads`"""
+        if self.reads is None:
+            return None
+        route = self.route(config)
+        settings = {key: route.get(key) for key in ("provider", "model", "temperature", "max_tokens")}
+        if self.stop_phrase and get_configurable(config, "early_stop", EARLY_STOP):
+            # An early-stopped reply is cut short, so it only answers early-stopped calls
+            settings["stop_phrase"] = self.stop_phrase
+        return memo_key(self.name, [settings, {field: state.get(field) for field in self.reads}])
+
+    def _memo_call(self, config):
+        """Call record of a reply taken from the memo: no tokens spent"""
+        route = self.route(config)
+        logger.info(f"{self.description} answered from the node memo")
+        return {"node": self.name, "provider": route["provider"], "model": route["model"],
+                "started": time.perf_counter(), "memoized": True,
+                "input_tokens": 0, "output_tokens": 0, "total_tokens": 0}
+
+    @staticmethod
+    def _remember(memo, key, content, update):
+        if key:
+            memo.put(key, content, update["llm_calls"][0])
+        return update
+
+    def _call_options(self, config):
+        """The call record for this call and the routing/streaming/hedging arguments"""
+        route = self.route(config)
+        call = {"node": self.name, "provider": route["provider"], "model": route["model"],
+                "started": time.perf_counter()}
+        options = {
+            "chain": failover_chain(route["provider"], route["model"], route.get("fallbacks")),
+            "llm_kwargs": {"temperature": route.get("temperature"), "max_tokens": route.get("max_tokens")},
+            "stream_callback": get_configurable(config, "stream_callback"),
+            "hedge": get_configurable(config, "hedge", HEDGE_ENABLED),
+            "priority": get_configurable(config, "priority"),
+            "stop_phrase": self.stop_phrase if get_configurable(config, "early_stop", EARLY_STOP) else None,
+        }
+        return call, options
+
+    def _update(self, state, messages, content, call):
+        update, trace = self.result(state, content)
+        call["latency_seconds"] = round(time.perf_counter() - call.pop("started"), 3)
+        call["iteration"] = 1 + sum(1 for c in state.get("llm_calls", []) if c["node"] == self.name)
+        return {
+            **update,
+            "messages": messages + [AIMessage(content=trace)],
+            "llm_calls": [call],
+            "tokens_used": call["total_tokens"]
+        }
+
+
+def with_memo(fn, memo, enabled=MEMOIZE):
+    """Answer an LLMNode from `memo` when the state fields it reads are unchanged.
+
+    Runs opt in or out with the config's `memoize` (default `enabled`).
+    """
+    node = getattr(fn, "__self__", fn)
+    if not isinstance(node, LLMNode) or node.reads is None:
+        return fn
+
+    if inspect.iscoroutinefunction(fn):
+        async def amemoized(state, config=None):
+            use_memo = get_configurable(config, "memoize", enabled)
+            return await node.ainvoke(state, config, memo=memo if use_memo else None)
+        return amemoized
+
+    def memoized(state, config=None):
+        use_memo = get_configurable(config, "memoize", enabled)
+        return node(state, config, memo=memo if use_memo else None)
+    return memoized
+
+
 def with_live_callback(fn, live_callback=None):
-    def wrapped(state):
-        new_state = fn(state)
-        if live_callback:
-            live_callback(new_state.get("messages", []))
+    """Report the message trace after each node to `live_callback`, or to the
+    run config's `live_callback` so one compiled graph can serve every run"""
+    pass_config = accepts_config(fn)
+
+    if inspect.iscoroutinefunction(fn):
+        async def awrapped(state, config=None):
+            new_state = await (fn(state, config) if pass_config else fn(state))
+            callback = live_callback or get_configurable(config, "live_callback")
+            if callback:
+                callback(state.get("messages", []) +
+                         new_state.get("messages", []))
+            return new_state
+        return awrapped
+
+    def wrapped(state, config=None):
+        new_state = fn(state, config) if pass_config else fn(state)
+        callback = live_callback or get_configurable(config, "live_callback")
+        if callback:
+            # Nodes only return their own messages; the callback expects the full trace
+            callback(state.get("messages", []) +
+                     new_state.get("messages", []))
         return new_state
     return wrapped
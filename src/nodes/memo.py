@@ -0,0 +1,76 @@
+
+import os
+import json
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Node memoization is opt-in: WORKFLOW_MEMOIZE=1, or memoize=True when building the graph
+MEMOIZE = os.getenv("WORKFLOW_MEMOIZE", "0") == "1"
+# Node replies kept in memory across runs and loop iterations (least recently used evicted)
+MEMO_SIZE = int(os.getenv("WORKFLOW_MEMO_SIZE", "1000"))
+
+
+def memo_key(node_name, inputs):
+    """Content address of one node invocation: the node, its model settings and the fields it reads"""
+    payload = json.dumps([node_name, inputs], sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class NodeMemo:
+    """LLM node replies by input hash, with hit/miss counts per node"""
+
+    def __init__(self, size=MEMO_SIZE):
+        self.size = size
+        self._entries = OrderedDict()
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def _node_stats(self, node_name):
+        return self._stats.setdefault(node_name, {"hits": 0, "misses": 0, "saved_tokens": 0,
+                                                  "saved_seconds": 0.0})
+
+    def get(self, node_name, key):
+        """The recorded reply for this key, or None (counted as a miss)"""
+        with self._lock:
+            stats = self._node_stats(node_name)
+            entry = self._entries.get(key)
+            if entry is None:
+                stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            stats["hits"] += 1
+            stats["saved_tokens"] += entry["total_tokens"]
+            stats["saved_seconds"] += entry["latency_seconds"]
+            return entry
+
+    def put(self, key, content, call):
+        with self._lock:
+            self._entries[key] = {"content": content, "total_tokens": call.get("total_tokens", 0),
+                                  "latency_seconds": call.get("latency_seconds", 0.0)}
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._stats.clear()
+
+    def stats(self):
+        with self._lock:
+            stats = {node: dict(s) for node, s in self._stats.items()}
+        for s in stats.values():
+            calls = s["hits"] + s["misses"]
+            s["hit_rate"] = s["hits"] / calls if calls else 0.0
+        return stats
+
+
+node_memo = NodeMemo()
+
+
+def memo_stats():
+    return node_memo.stats()
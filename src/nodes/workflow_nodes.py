@@ -1,10 +1,9 @@
 
-from langchain_core.messages import HumanMessage, SystemMessage, AIMessage
-from src.llms.factory import get_llm
-from src.nodes.common import timer, read_file, extract_content_after_pattern
-from src.state.state import GraphState, APPROVED_PHRASES, MAX_ITERATIONS
+from langchain_core.messages import HumanMessage, SystemMessage, AIMessage, BaseMessage
+from src.nodes.common import timer, read_file, extract_content_after_pattern, LLMNode
+from src.state.state import GraphState, APPROVED_PHRASES, MAX_ITERATIONS, DEFAULT_REQUIREMENT_PATH
 from langgraph.graph import StateGraph, START, END
-from typing import List, Dict, Any, Optional, Union
+from typing import List, Dict, Any, Optional, Tuple, Union
 import logging
 
 logger = logging.getLogger(__name__)
@@ -14,20 +13,33 @@ logging.basicConfig(level=logging.INFO,
                     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Each LLM-backed node is split into a prompt builder and a result builder so
+# that the same node logic can be driven by `invoke` or `ainvoke` (see LLMNode).
+
 
 def get_user_requirements_node(state: GraphState) -> GraphState:
-    """Node that retrieves user requirements from file"""
+    """Node that retrieves user requirements from the run input or its requirement file"""
 
     logger.info("Getting user requirements...")
 
+    # Requirement text passed in with the run takes precedence over any file
+    if state.get("user_requirement"):
+        return {"user_requirement": state["user_requirement"]}
+
+    requirement_path = state.get("requirement_path") or DEFAULT_REQUIREMENT_PATH
     with timer("Reading requirements file"):
-        user_requirements = read_file("req_build.md", "No requirements found")
+        user_requirements = read_file(requirement_path, "No requirements found")
 
     return {"user_requirement": user_requirements}
 
 
-def generate_user_stories_node(state: GraphState) -> GraphState:
-    """Node that generates user stories based on requirements"""
+async def aget_user_requirements_node(state: GraphState) -> GraphState:
+    """Async variant of get_user_requirements_node"""
+    return get_user_requirements_node(state)
+
+
+def _generate_user_stories_prompt(state: GraphState) -> List[BaseMessage]:
+    """Prompt for generating user stories based on requirements"""
 
     current_state = state
     user_requirements = current_state['user_requirement']
@@ -38,72 +50,59 @@ def generate_user_stories_node(state: GraphState) -> GraphState:
     logger.info(
         f"Generating user stories (iteration {stories_correction_iteration})...")
 
-    messages = [
+    return [
         SystemMessage(content="You are an expert Product Manager. Your job is to create well-structured user stories for the given requirement for the developers to implement and return the response as Python list. If feedback is provided, modify the stories based on the feedback."),
         HumanMessage(
             content=f"Generate list of user stories for requirement:  \n\n  {user_requirements} or if feedbacks are provided on user stories in {po_review_comment}, modify them based on the feedbacks. Each user story should have a title, description, acceptance criteria, priority and status.Return the response in Markdown format with list of user stories")
     ]
 
-    with timer("User stories generation"):
-        # llm = get_llm("groq", "deepseek-r1-distill-llama-70b")
-        llm = get_llm("google", "gemini-2.0-flash")
-        response = llm.invoke(messages)
-        user_stories = response.content.strip()
-        user_stories = extract_content_after_pattern(user_stories)
-
-    # Update state
-    new_messages = state.get("messages", []) + messages + [
-        AIMessage(
-            content=f"AI is now acting as Product Manager. Here are the Generated User Stories: {user_stories}")
-    ]
 
+def _generate_user_stories_result(state: GraphState, user_stories: str) -> Tuple[Dict, str]:
+    user_stories = extract_content_after_pattern(user_stories)
     return {
-        "user_requirement": state["user_requirement"],
         "generated_user_stories": user_stories,
-        "stories_correction_iteration": stories_correction_iteration + 1,
-        "po_review_comment": current_state.get("po_review_comment", ""),
-        "design_doc_review_iteration": current_state.get("design_doc_review_iteration", 0),
-        "design_doc": current_state.get("design_doc", ""),
-        "design_doc_review_comments": current_state.get("design_doc_review_comments", ""),
-        "messages": new_messages
-    }
+        "stories_correction_iteration": state.get('stories_correction_iteration', 0) + 1
+    }, f"AI is now acting as Product Manager. Here are the Generated User Stories: {user_stories}"
+
 
+# Node that generates user stories based on requirements
+generate_user_stories_node = LLMNode(
+    "generate_user_stories", "User stories generation",
+    _generate_user_stories_prompt, _generate_user_stories_result,
+    reads=["user_requirement", "po_review_comment"])
 
-def po_review_stories_node(state: GraphState) -> GraphState:
-    """Node for product owner to review user stories"""
+
+def _po_review_stories_prompt(state: GraphState) -> List[BaseMessage]:
+    """Prompt for the product owner to review user stories"""
 
     user_requirements = state["user_requirement"]
     user_stories = state["generated_user_stories"]
 
     logger.info("PO is reviewing user stories...")
 
-    messages = [
+    return [
         SystemMessage(content="You are a Product Owner. Your job is to provide feedback on User Stories against the given requirement and either approve it or provide feedback. The goal is to build MVP first i.e build product fast and then iterate on it."),
         HumanMessage(content=f"Review the List of User Stories:  \n\n  {user_stories} against user requirement:  \n\n  {user_requirements}. If you approve of all the user stories then mention 'Here is my approval for all user stories' in your review comments else provide feedback on the user stories with the changes required and start your comments with 'Here are the changes required' and don't mention word 'approved' anywhere in your comments.")
     ]
 
-    with timer("PO review"):
-        # llm = get_llm("groq", "deepseek-r1-distill-qwen-32b")
-        llm = get_llm("google", "gemini-2.0-flash")
-        response = llm.invoke(messages)
-        po_review_comment = response.content.strip()
-        po_review_comment = extract_content_after_pattern(po_review_comment)
-
-    # Update state
-    new_messages = state.get("messages", []) + messages + [
-        AIMessage(
-            content=f"AI is now acting as Product owner.Here is the Generated Product owner Review comment for user stories: {po_review_comment}")
-    ]
 
+def _po_review_stories_result(state: GraphState, po_review_comment: str) -> Tuple[Dict, str]:
+    po_review_comment = extract_content_after_pattern(po_review_comment)
     return {
-        **state,
-        "po_review_comment": po_review_comment,
-        "messages": new_messages
-    }
+        "po_review_comment": po_review_comment
+    }, f"AI is now acting as Product owner.Here is the Generated Product owner Review comment for user stories: {po_review_comment}"
+
 
+# Node for product owner to review user stories
+po_review_stories_node = LLMNode(
+    "po_review_stories", "PO review",
+    _po_review_stories_prompt, _po_review_stories_result,
+    stop_phrase=APPROVED_PHRASES["user_stories"],
+    reads=["user_requirement", "generated_user_stories"])
 
-def create_design_doc_node(state: GraphState) -> GraphState:
-    """Node to create functional and technical design documents"""
+
+def _create_design_doc_prompt(state: GraphState) -> List[BaseMessage]:
+    """Prompt for creating functional and technical design documents"""
 
     user_requirements = state["user_requirement"]
     user_stories = state["generated_user_stories"]
@@ -113,33 +112,29 @@ def create_design_doc_node(state: GraphState) -> GraphState:
     logger.info(
         f"Generating design documents (iteration {design_doc_review_iteration})...")
 
-    messages = [
+    return [
         SystemMessage(content="You are a Software Architect with strong business analysis skills. Your job is to create comprehensive Functional and Technical design documents of great quality against given requirement and user stories."),
         HumanMessage(
             content=f"Create Functional and Technical design documents based on user stories :  \n\n  {user_stories} against user requirement:  \n\n  {user_requirements}. If feedback is present in design document  review:  \n\n {design_doc_review_comments} modify the document accordingly. Return document in markdown format.")
     ]
 
-    with timer("Design document creation"):
-        llm = get_llm("google", "gemini-2.0-flash")
-        response = llm.invoke(messages)
-        design_doc = response.content.strip()
-
-    # Update state
-    new_messages = state.get("messages", []) + messages + [
-        AIMessage(
-            content=f"AI is now acting as Software Architect and creating Functional and Technical design doc.Here is the generated functional and technical design doc: {design_doc}")
-    ]
 
+def _create_design_doc_result(state: GraphState, design_doc: str) -> Tuple[Dict, str]:
     return {
-        **state,
         "design_doc": design_doc,
-        "design_doc_review_iteration": design_doc_review_iteration + 1,
-        "messages": new_messages
-    }
+        "design_doc_review_iteration": state.get("design_doc_review_iteration", 0) + 1
+    }, f"AI is now acting as Software Architect and creating Functional and Technical design doc.Here is the generated functional and technical design doc: {design_doc}"
+
 
+# Node to create functional and technical design documents
+create_design_doc_node = LLMNode(
+    "create_design_doc", "Design document creation",
+    _create_design_doc_prompt, _create_design_doc_result,
+    reads=["user_requirement", "generated_user_stories", "design_doc_review_comments"])
 
-def design_doc_review_node(state: GraphState) -> GraphState:
-    """Node for reviewing design documents"""
+
+def _design_doc_review_prompt(state: GraphState) -> List[BaseMessage]:
+    """Prompt for reviewing design documents"""
 
     user_requirements = state["user_requirement"]
     user_stories = state["generated_user_stories"]
@@ -147,31 +142,28 @@ def design_doc_review_node(state: GraphState) -> GraphState:
 
     logger.info("Reviewing design documents...")
 
-    messages = [
+    return [
         SystemMessage(content="You are a Software Architect. Your job is to review Functional and Technical design documents against given requirement and user stories. Don't nitpick and be liberal while providing feedback."),
         HumanMessage(content=f"Review the Functional and Technical design documents:  \n\n  {design_doc} based on user stories:  \n\n  {user_stories} and user requirement:  \n\n  {user_requirements}. If you are happy with the documents, mention 'Go ahead, Here is my approval for the design documents' or else provide feedback on the documents and start your comments with 'Here are the changes required' and don't mention word 'approved' anywhere in your comments.")
     ]
 
-    with timer("Design document review"):
-        llm = get_llm("google", "gemini-2.0-flash")
-        response = llm.invoke(messages)
-        design_doc_review_comments = response.content.strip()
-
-    # Update state
-    new_messages = state.get("messages", []) + messages + [
-        AIMessage(
-            content=f"AI is now acting as Software Architect and reviewing Functional and Technical design doc.Here is the generated Functional and technical design doc review comments: {design_doc_review_comments}")
-    ]
 
+def _design_doc_review_result(state: GraphState, design_doc_review_comments: str) -> Tuple[Dict, str]:
     return {
-        **state,
-        "design_doc_review_comments": design_doc_review_comments,
-        "messages": new_messages
-    }
+        "design_doc_review_comments": design_doc_review_comments
+    }, f"AI is now acting as Software Architect and reviewing Functional and Technical design doc.Here is the generated Functional and technical design doc review comments: {design_doc_review_comments}"
+
 
+# Node for reviewing design documents
+design_doc_review_node = LLMNode(
+    "design_doc_review", "Design document review",
+    _design_doc_review_prompt, _design_doc_review_result,
+    stop_phrase=APPROVED_PHRASES["design_doc"],
+    reads=["user_requirement", "generated_user_stories", "design_doc"])
 
-def coder_node(state: GraphState) -> GraphState:
-    """Node that generates code based on requirements and design"""
+
+def _coder_prompt(state: GraphState) -> List[BaseMessage]:
+    """Prompt for generating code based on requirements and design"""
 
     user_requirements = state["user_requirement"]
     user_stories = state["generated_user_stories"]
@@ -183,33 +175,29 @@ def coder_node(state: GraphState) -> GraphState:
 
     logger.info(f"Generating code (iteration {code_review_iteration})...")
 
-    messages = [
+    return [
         SystemMessage(content="You are an expert Agentic AI developer with knowledge of Crew AI agents and back end developer too with skills in Agentic AI, Python, FastAPI. Your job is to create code for the given requirement, user stories and design document that will accurately implement the functionality. If peer review comments or security review feedbacks are provided, implement those changes to code accordingly and Fix QA issues if mentioned.Generate code in a modular way and provide doc string for each function."),
         HumanMessage(
             content=f"Generate the code as per the requirement:  \n\n  {user_requirements}, user stories:  \n\n {user_stories}, Functional and Technical Design:  \n\n {design_doc}. If peer comments are provided in code review comments \n\n  {code_review_comments} or security review aspect of code is present in {security_review_comments}, implement those changes too in the code. If QA testing is failed as per {qa_testing_result} fix the code accordingly to fix QA issues.")
     ]
 
-    with timer("Code generation"):
-        llm = get_llm("google", "gemini-2.0-flash")
-        response = llm.invoke(messages)
-        generated_code = response.content.strip()
-
-    # Update state
-    new_messages = state.get("messages", []) + messages + [
-        AIMessage(
-            content=f"AI is now acting as python coder and generating code. Here is the Generated Code: {generated_code}")
-    ]
 
+def _coder_result(state: GraphState, generated_code: str) -> Tuple[Dict, str]:
     return {
-        **state,
         "generated_code": generated_code,
-        "code_review_iteration": code_review_iteration + 1,
-        "messages": new_messages
-    }
+        "code_review_iteration": state.get("code_review_iteration", 0) + 1
+    }, f"AI is now acting as python coder and generating code. Here is the Generated Code: {generated_code}"
+
+
+# Node that generates code based on requirements and design
+coder_node = LLMNode(
+    "coder", "Code generation",
+    _coder_prompt, _coder_result,
+    reads=["user_requirement", "generated_user_stories", "design_doc", "code_review_comments", "security_review_comments", "qa_testing_result"])
 
 
-def code_reviewer_node(state: GraphState) -> GraphState:
-    """Node for reviewing generated code"""
+def _code_reviewer_prompt(state: GraphState) -> List[BaseMessage]:
+    """Prompt for reviewing generated code"""
 
     user_requirements = state["user_requirement"]
     user_stories = state["generated_user_stories"]
@@ -218,31 +206,28 @@ def code_reviewer_node(state: GraphState) -> GraphState:
 
     logger.info("Reviewing code...")
 
-    messages = [
+    return [
         SystemMessage(content="You are a code reviewer. Your job is to review the code against the given requirement, stories and design doc and check if it implements all the functionalities and covers all scenarios. Return 'no additional review comments' if you find the code is good enough."),
         HumanMessage(content=f"Peer review the code:  \n\n  {generated_code} against the requirement:  \n\n  {user_requirements}, user stories:  \n\n  {user_stories}, Functional and Technical Design:  \n\n {design_doc} and provide your review comments on the code. Don't nitpick while providing your review comments. Return 'no additional review comments' if you find the code is good enough.")
     ]
 
-    with timer("Code review"):
-        llm = get_llm("google", "gemini-2.0-flash")
-        response = llm.invoke(messages)
-        code_review_comments = response.content.strip()
-
-    # Update state
-    new_messages = state.get("messages", []) + messages + [
-        AIMessage(
-            content=f"AI is now acting as code reviewer.Here is the Generated code review comments: {code_review_comments}")
-    ]
 
+def _code_reviewer_result(state: GraphState, code_review_comments: str) -> Tuple[Dict, str]:
     return {
-        **state,
-        "code_review_comments": code_review_comments,
-        "messages": new_messages
-    }
+        "code_review_comments": code_review_comments
+    }, f"AI is now acting as code reviewer.Here is the Generated code review comments: {code_review_comments}"
+
 
+# Node for reviewing generated code
+code_reviewer_node = LLMNode(
+    "code_reviewer", "Code review",
+    _code_reviewer_prompt, _code_reviewer_result,
+    stop_phrase=APPROVED_PHRASES["code_review"],
+    reads=["user_requirement", "generated_user_stories", "design_doc", "generated_code"])
 
-def security_review_node(state: GraphState) -> GraphState:
-    """Node for security review of code"""
+
+def _security_review_prompt(state: GraphState) -> List[BaseMessage]:
+    """Prompt for security review of code"""
 
     user_requirements = state["user_requirement"]
     user_stories = state["generated_user_stories"]
@@ -253,32 +238,75 @@ def security_review_node(state: GraphState) -> GraphState:
     logger.info(
         f"Performing security review (iteration {security_review_iteration})...")
 
-    messages = [
+    return [
         SystemMessage(content="You are a Software Security Engineer. Your job is to review the security aspects of code against the given requirement, stories and design doc and provide security review feedback. Return 'no additional security review comments' if you find the code is good enough regarding security."),
         HumanMessage(content=f"Do the security review of the code:  \n\n  {generated_code} against the requirement:  \n\n {user_requirements}, user stories:  \n\n  {user_stories}, Functional and Technical Design:  \n\n {design_doc} and provide your feedback on the code regarding security. Don't nitpick while providing your feedback. Return 'no additional security review comments' if you find the code is good enough.")
     ]
 
-    with timer("Security review"):
-        llm = get_llm("google", "gemini-2.0-flash")
-        response = llm.invoke(messages)
-        security_review_comments = response.content.strip()
-
-    # Update state
-    new_messages = state.get("messages", []) + messages + [
-        AIMessage(
-            content=f"AI is now acting as Security Engineer and performing security review.Here is the Generated security review comments: {security_review_comments}")
-    ]
 
+def _security_review_result(state: GraphState, security_review_comments: str) -> Tuple[Dict, str]:
     return {
-        **state,
         "security_review_comments": security_review_comments,
-        "security_review_iteration": security_review_iteration + 1,
-        "messages": new_messages
+        "security_review_iteration": state.get("security_review_iteration", 0) + 1
+    }, f"AI is now acting as Security Engineer and performing security review.Here is the Generated security review comments: {security_review_comments}"
+
+
+# Node for security review of code
+security_review_node = LLMNode(
+    "security_review", "Security review",
+    _security_review_prompt, _security_review_result,
+    stop_phrase=APPROVED_PHRASES["security_review"],
+    reads=["user_requirement", "generated_user_stories", "design_doc", "generated_code"])
+
+
+def review_join_node(state: GraphState) -> GraphState:
+    """Node that joins the concurrent code and security reviews"""
+
+    code_approved = APPROVED_PHRASES["code_review"] in state.get(
+        "code_review_comments", "").lower()
+    security_approved = APPROVED_PHRASES["security_review"] in state.get(
+        "security_review_comments", "").lower()
+
+    logger.info(
+        f"Joining reviews (code approved: {code_approved}, security approved: {security_approved})...")
+
+    return {
+        "messages": [
+            AIMessage(
+                content=f"AI is now acting as Review Coordinator. Code review approved: {code_approved}, security review approved: {security_approved}")
+        ]
     }
 
 
-def write_test_cases_node(state: GraphState) -> GraphState:
-    """Node for writing test cases"""
+async def areview_join_node(state: GraphState) -> GraphState:
+    """Async variant of review_join_node"""
+    return review_join_node(state)
+
+
+def code_ready_node(state: GraphState) -> GraphState:
+    """Barrier reached when the code review loop is done (overlapped test authoring)"""
+    logger.info(f"Code ready for QA (review iteration {state.get('code_review_iteration', 0)})")
+    return {"messages": []}
+
+
+async def acode_ready_node(state: GraphState) -> GraphState:
+    """Async variant of code_ready_node"""
+    return code_ready_node(state)
+
+
+def tests_ready_node(state: GraphState) -> GraphState:
+    """Barrier reached when the test case review loop is done (overlapped test authoring)"""
+    logger.info(f"Test cases ready for QA (review iteration {state.get('test_case_review_iteration', 0)})")
+    return {"messages": []}
+
+
+async def atests_ready_node(state: GraphState) -> GraphState:
+    """Async variant of tests_ready_node"""
+    return tests_ready_node(state)
+
+
+def _write_test_cases_prompt(state: GraphState) -> List[BaseMessage]:
+    """Prompt for writing test cases"""
 
     user_requirements = state["user_requirement"]
     user_stories = state["generated_user_stories"]
@@ -290,33 +318,29 @@ def write_test_cases_node(state: GraphState) -> GraphState:
     logger.info(
         f"Generating test cases (iteration {test_case_review_iteration})...")
 
-    messages = [
+    return [
         SystemMessage(content="You are a Software Development Engineer in Test (SDET). Your job is to write test cases against the given requirement, stories, design doc and security review comments."),
         HumanMessage(
             content=f"Write test cases against the user requirement:  \n\n  {user_requirements}, user stories:  \n\n  {user_stories}, Functional and Technical Design:  \n\n  {design_doc}, Security Review comments:  \n\n {security_review_comments}. If you find feedback in Test Case Review:  \n\n  {test_case_review_comments}, modify test cases accordingly.")
     ]
 
-    with timer("Test case generation"):
-        llm = get_llm("google", "gemini-2.0-flash")
-        response = llm.invoke(messages)
-        generated_test_cases = response.content.strip()
-
-    # Update state
-    new_messages = state.get("messages", []) + messages + [
-        AIMessage(
-            content=f"AI is now acting as Software Development Engineer in Test (SDET) and creating test cases. Here are the generated test cases: {generated_test_cases}")
-    ]
 
+def _write_test_cases_result(state: GraphState, generated_test_cases: str) -> Tuple[Dict, str]:
     return {
-        **state,
         "generated_test_cases": generated_test_cases,
-        "test_case_review_iteration": test_case_review_iteration + 1,
-        "messages": new_messages
-    }
+        "test_case_review_iteration": state.get("test_case_review_iteration", 0) + 1
+    }, f"AI is now acting as Software Development Engineer in Test (SDET) and creating test cases. Here are the generated test cases: {generated_test_cases}"
+
 
+# Node for writing test cases
+write_test_cases_node = LLMNode(
+    "write_test_cases", "Test case generation",
+    _write_test_cases_prompt, _write_test_cases_result,
+    reads=["user_requirement", "generated_user_stories", "design_doc", "security_review_comments", "test_case_review_comments"])
 
-def test_case_review_node(state: GraphState) -> GraphState:
-    """Node for reviewing test cases"""
+
+def _test_case_review_prompt(state: GraphState) -> List[BaseMessage]:
+    """Prompt for reviewing test cases"""
 
     user_requirements = state["user_requirement"]
     user_stories = state["generated_user_stories"]
@@ -326,31 +350,28 @@ def test_case_review_node(state: GraphState) -> GraphState:
 
     logger.info("Reviewing test cases...")
 
-    messages = [
+    return [
         SystemMessage(content="You are a QA Lead/Manager. Your job is to review test cases against the given requirement, stories, design doc and security review comments and provide feedback. Return 'no additional test case review comments' if you find the test cases coverage are good enough."),
         HumanMessage(content=f"Review test cases:  \n\n  {generated_test_cases} against the requirement:  \n\n {user_requirements}, user stories:  \n\n {user_stories}, Functional and Technical Design:  \n\n {design_doc}, Security Review comments:  \n\n {security_review_comments} and provide feedback. Don't nitpick while providing your feedback. Return 'no additional test case review comments' if you find the test cases coverage are good enough.")
     ]
 
-    with timer("Test case review"):
-        llm = get_llm("google", "gemini-2.0-flash")
-        response = llm.invoke(messages)
-        test_case_review_comments = response.content.strip()
-
-    # Update state
-    new_messages = state.get("messages", []) + messages + [
-        AIMessage(
-            content=f"AI is now acting as QA Lead/Manager and reviewing test cases. Here are the test case review comments: {test_case_review_comments}")
-    ]
 
+def _test_case_review_result(state: GraphState, test_case_review_comments: str) -> Tuple[Dict, str]:
     return {
-        **state,
-        "test_case_review_comments": test_case_review_comments,
-        "messages": new_messages
-    }
+        "test_case_review_comments": test_case_review_comments
+    }, f"AI is now acting as QA Lead/Manager and reviewing test cases. Here are the test case review comments: {test_case_review_comments}"
+
+
+# Node for reviewing test cases
+test_case_review_node = LLMNode(
+    "test_case_review", "Test case review",
+    _test_case_review_prompt, _test_case_review_result,
+    stop_phrase=APPROVED_PHRASES["test_case_review"],
+    reads=["user_requirement", "generated_user_stories", "design_doc", "generated_test_cases", "security_review_comments"])
 
 
-def qa_testing_node(state: GraphState) -> GraphState:
-    """Node for QA testing based on test cases and code"""
+def _qa_testing_prompt(state: GraphState) -> List[BaseMessage]:
+    """Prompt for QA testing based on test cases and code"""
 
     user_requirements = state["user_requirement"]
     generated_code = state["generated_code"]
@@ -360,28 +381,25 @@ def qa_testing_node(state: GraphState) -> GraphState:
     logger.info(
         f"Running QA testing (iteration {qa_testing_iteration} )...")
 
-    messages = [
+    return [
         SystemMessage(content="You are a QA Engineer. Your job is to execute the test cases against the code and determine if it passes all tests. Evaluate thoroughly if the code successfully implements all the required functionality."),
         HumanMessage(content=f"Execute the test cases: {generated_test_cases} against the code:  \n\n  {generated_code} and requirement: \n\n {user_requirements}. If all tests pass or have only minor issues, respond with 'QA Testing Passed'. If there are significant issues that need fixing, respond with 'QA Testing Failed' and provide details of the issues. If you find any issues in the code, please mention them in your response.")
     ]
 
-    with timer("QA testing"):
-        llm = get_llm("google", "gemini-2.0-flash")
-        response = llm.invoke(messages)
-        qa_testing_result = response.content.strip()
-
-    # Update state
-    new_messages = state.get("messages", []) + messages + [
-        AIMessage(
-            content=f"AI is now acting as QA Engineer and executing test cases. Here are the QA Testing Results: {qa_testing_result}")
-    ]
 
+def _qa_testing_result(state: GraphState, qa_testing_result: str) -> Tuple[Dict, str]:
     return {
-        **state,
-        "qa_testing_iteration": qa_testing_iteration + 1,
-        "qa_testing_result": qa_testing_result,
-        "messages": new_messages
-    }
+        "qa_testing_iteration": state["qa_testing_iteration"] + 1,
+        "qa_testing_result": qa_testing_result
+    }, f"AI is now acting as QA Engineer and executing test cases. Here are the QA Testing Results: {qa_testing_result}"
+
+
+# Node for QA testing based on test cases and code
+qa_testing_node = LLMNode(
+    "qa_testing", "QA testing",
+    _qa_testing_prompt, _qa_testing_result,
+    stop_phrase=APPROVED_PHRASES["qa_testing"],
+    reads=["user_requirement", "generated_code", "generated_test_cases"])
 
 
 # def fix_code_after_qa_node(state: GraphState) -> GraphState:
@@ -417,40 +435,38 @@ def qa_testing_node(state: GraphState) -> GraphState:
 #     }
 
 
-def deployment_node(state: GraphState) -> GraphState:
-    """Node for creating deployment plan"""
+
+
+def _deployment_prompt(state: GraphState) -> List[BaseMessage]:
+    """Prompt for creating deployment plan"""
 
     user_requirements = state["user_requirement"]
     generated_code = state["generated_code"]
 
     logger.info("Preparing deployment plan...")
 
-    messages = [
+    return [
         SystemMessage(content="You are a DevOps Engineer. Your job is to create a deployment plan for the code including any necessary infrastructure configuration, environment setup, and monitoring configuration."),
         HumanMessage(
             content=f"Create a deployment plan for the following code: \n\n Code: {generated_code} \n\n Requirement: {user_requirements} \n\n Include details on environment setup, configuration files, deployment steps, and any monitoring that should be set up.")
     ]
 
-    with timer("Deployment planning"):
-        llm = get_llm("google", "gemini-2.0-flash")
-        response = llm.invoke(messages)
-        deployment_plan = response.content.strip()
-
-    # Update state
-    new_messages = state.get("messages", []) + messages + [
-        AIMessage(
-            content=f"AI is now acting as DevOps Engineer and creating deployment plan. Here is the Deployment Plan: {deployment_plan}")
-    ]
 
+def _deployment_result(state: GraphState, deployment_plan: str) -> Tuple[Dict, str]:
     return {
-        **state,
-        "deployment_plan": deployment_plan,
-        "messages": new_messages
-    }
+        "deployment_plan": deployment_plan
+    }, f"AI is now acting as DevOps Engineer and creating deployment plan. Here is the Deployment Plan: {deployment_plan}"
 
 
-def monitoring_feedback_node(state: GraphState) -> GraphState:
-    """Node for setting up monitoring and feedback collection"""
+# Node for creating deployment plan
+deployment_node = LLMNode(
+    "deployment", "Deployment planning",
+    _deployment_prompt, _deployment_result,
+    reads=["user_requirement", "generated_code"])
+
+
+def _monitoring_feedback_prompt(state: GraphState) -> List[BaseMessage]:
+    """Prompt for setting up monitoring and feedback collection"""
 
     user_requirements = state["user_requirement"]
     generated_code = state["generated_code"]
@@ -458,32 +474,30 @@ def monitoring_feedback_node(state: GraphState) -> GraphState:
 
     logger.info("Setting up monitoring and feedback collection...")
 
-    messages = [
+    # With parallel ops plans the deployment plan is still being written
+    deployment = f" \n\n Deployment Plan: {deployment_plan}" if deployment_plan else ""
+    return [
         SystemMessage(content="You are a Site Reliability Engineer (SRE). Your job is to design monitoring systems and feedback collection mechanisms for the deployed application."),
         HumanMessage(
-            content=f"Design monitoring systems and feedback collection for: \n\n Code: {generated_code} \n\n Deployment Plan: {deployment_plan} \n\n Requirement: {user_requirements} \n\n Include details on metrics to track, alerting thresholds, logging strategies, and user feedback collection methods.")
+            content=f"Design monitoring systems and feedback collection for: \n\n Code: {generated_code}{deployment} \n\n Requirement: {user_requirements} \n\n Include details on metrics to track, alerting thresholds, logging strategies, and user feedback collection methods.")
     ]
 
-    with timer("Monitoring setup"):
-        llm = get_llm("google", "gemini-2.0-flash")
-        response = llm.invoke(messages)
-        monitoring_plan = response.content.strip()
-
-    # Update state
-    new_messages = state.get("messages", []) + messages + [
-        AIMessage(
-            content=f"AI is now acting as Site Reliability Engineer (SRE) and creating Design monitoring systems. Here is the Monitoring and Feedback Plan: {monitoring_plan}")
-    ]
 
+def _monitoring_feedback_result(state: GraphState, monitoring_plan: str) -> Tuple[Dict, str]:
     return {
-        **state,
-        "monitoring_plan": monitoring_plan,
-        "messages": new_messages
-    }
+        "monitoring_plan": monitoring_plan
+    }, f"AI is now acting as Site Reliability Engineer (SRE) and creating Design monitoring systems. Here is the Monitoring and Feedback Plan: {monitoring_plan}"
+
 
+# Node for setting up monitoring and feedback collection
+monitoring_feedback_node = LLMNode(
+    "monitoring_feedback", "Monitoring setup",
+    _monitoring_feedback_prompt, _monitoring_feedback_result,
+    reads=["user_requirement", "generated_code", "deployment_plan"])
 
-def maintenance_updates_node(state: GraphState) -> GraphState:
-    """Node for creating maintenance and updates plan"""
+
+def _maintenance_updates_prompt(state: GraphState) -> List[BaseMessage]:
+    """Prompt for creating maintenance and updates plan"""
 
     user_requirements = state["user_requirement"]
     generated_code = state["generated_code"]
@@ -491,28 +505,100 @@ def maintenance_updates_node(state: GraphState) -> GraphState:
 
     logger.info("Creating maintenance and updates plan...")
 
-    messages = [
+    monitoring = f" \n\n Monitoring Plan: {monitoring_plan}" if monitoring_plan else ""
+    return [
         SystemMessage(content="You are a Software Maintenance Engineer. Your job is to create a maintenance plan for the application including update strategies, technical debt management, and future enhancement roadmap."),
         HumanMessage(
-            content=f"Create a maintenance and updates plan for: \n\n Code: {generated_code} \n\n Requirement: {user_requirements} \n\n Monitoring Plan: {monitoring_plan} \n\n Include strategies for updates, dependency management, performance optimization, and potential future enhancements.")
+            content=f"Create a maintenance and updates plan for: \n\n Code: {generated_code} \n\n Requirement: {user_requirements}{monitoring} \n\n Include strategies for updates, dependency management, performance optimization, and potential future enhancements.")
     ]
 
-    with timer("Maintenance planning"):
-        llm = get_llm("google", "gemini-2.0-flash")
-        response = llm.invoke(messages)
-        maintenance_plan = response.content.strip()
 
-    # Update state
-    new_messages = state.get("messages", []) + messages + [
-        AIMessage(
-            content=f"AI is now acting as Software Maintenance Engineer and creating Maintenance and Updates Plan:,Her it is {maintenance_plan}")
+def _maintenance_updates_result(state: GraphState, maintenance_plan: str) -> Tuple[Dict, str]:
+    return {
+        "maintenance_plan": maintenance_plan
+    }, f"AI is now acting as Software Maintenance Engineer and creating Maintenance and Updates Plan:,Her it is {maintenance_plan}"
+
+
+# Node for creating maintenance and updates plan
+maintenance_updates_node = LLMNode(
+    "maintenance_updates", "Maintenance planning",
+    _maintenance_updates_prompt, _maintenance_updates_result,
+    reads=["user_requirement", "generated_code", "monitoring_plan"])
+
+
+def _refine_monitoring_prompt(state: GraphState) -> List[BaseMessage]:
+    """Prompt for aligning a monitoring plan drafted in parallel with the deployment plan"""
+
+    deployment_plan = state["deployment_plan"]
+    monitoring_plan = state["monitoring_plan"]
+
+    logger.info("Refining monitoring plan against the deployment plan...")
+
+    return [
+        SystemMessage(content="You are a Site Reliability Engineer (SRE). Your job is to keep the monitoring plan consistent with how the application is deployed."),
+        HumanMessage(
+            content=f"Revise the monitoring plan so it fits the deployment plan (environments, services, configuration). Keep everything that still applies and return the complete plan. \n\n Deployment Plan: {deployment_plan} \n\n Monitoring Plan: {monitoring_plan}")
     ]
 
+
+def _refine_monitoring_result(state: GraphState, monitoring_plan: str) -> Tuple[Dict, str]:
     return {
-        **state,
-        "maintenance_plan": maintenance_plan,
-        "messages": new_messages
-    }
+        "monitoring_plan": monitoring_plan
+    }, f"AI is now acting as Site Reliability Engineer (SRE) and aligning the monitoring plan with the deployment plan. Here is the Monitoring and Feedback Plan: {monitoring_plan}"
+
+
+# Node for refining the monitoring plan once the deployment plan is in (parallel ops plans)
+refine_monitoring_node = LLMNode(
+    "refine_monitoring", "Monitoring plan refinement",
+    _refine_monitoring_prompt, _refine_monitoring_result,
+    reads=["deployment_plan", "monitoring_plan"])
+
+
+def _refine_maintenance_prompt(state: GraphState) -> List[BaseMessage]:
+    """Prompt for aligning a maintenance plan drafted in parallel with the other ops plans"""
+
+    deployment_plan = state["deployment_plan"]
+    monitoring_plan = state["monitoring_plan"]
+    maintenance_plan = state["maintenance_plan"]
+
+    logger.info("Refining maintenance plan against the deployment and monitoring plans...")
+
+    return [
+        SystemMessage(content="You are a Software Maintenance Engineer. Your job is to keep the maintenance plan consistent with the deployment and monitoring plans."),
+        HumanMessage(
+            content=f"Revise the maintenance and updates plan so it fits the deployment plan and the monitoring plan. Keep everything that still applies and return the complete plan. \n\n Deployment Plan: {deployment_plan} \n\n Monitoring Plan: {monitoring_plan} \n\n Maintenance Plan: {maintenance_plan}")
+    ]
+
+
+def _refine_maintenance_result(state: GraphState, maintenance_plan: str) -> Tuple[Dict, str]:
+    return {
+        "maintenance_plan": maintenance_plan
+    }, f"AI is now acting as Software Maintenance Engineer and aligning the Maintenance and Updates Plan with the other plans. Here it is: {maintenance_plan}"
+
+
+# Node for refining the maintenance plan once the other plans are in (parallel ops plans)
+refine_maintenance_node = LLMNode(
+    "refine_maintenance", "Maintenance plan refinement",
+    _refine_maintenance_prompt, _refine_maintenance_result,
+    reads=["deployment_plan", "monitoring_plan", "maintenance_plan"])
+
+
+# Async variants of the LLM nodes, used when the graph is driven by `ainvoke`
+agenerate_user_stories_node = generate_user_stories_node.ainvoke
+apo_review_stories_node = po_review_stories_node.ainvoke
+acreate_design_doc_node = create_design_doc_node.ainvoke
+adesign_doc_review_node = design_doc_review_node.ainvoke
+acoder_node = coder_node.ainvoke
+acode_reviewer_node = code_reviewer_node.ainvoke
+asecurity_review_node = security_review_node.ainvoke
+awrite_test_cases_node = write_test_cases_node.ainvoke
+atest_case_review_node = test_case_review_node.ainvoke
+aqa_testing_node = qa_testing_node.ainvoke
+adeployment_node = deployment_node.ainvoke
+amonitoring_feedback_node = monitoring_feedback_node.ainvoke
+amaintenance_updates_node = maintenance_updates_node.ainvoke
+arefine_monitoring_node = refine_monitoring_node.ainvoke
+arefine_maintenance_node = refine_maintenance_node.ainvoke
 
 
 # def build_workflow_graph():
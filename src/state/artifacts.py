@@ -0,0 +1,162 @@
+
+import os
+import re
+import json
+import hashlib
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Directory holding the artifacts of the last run of each requirement
+ARTIFACT_DIR = os.getenv("WORKFLOW_ARTIFACT_DIR", ".workflow_artifacts")
+
+# Pipeline stages in order, with the state fields each one produces
+STAGES = [
+    ("stories", ["generated_user_stories", "po_review_comment", "stories_correction_iteration"]),
+    ("design", ["design_doc", "design_doc_review_comments", "design_doc_review_iteration"]),
+    ("code", ["generated_code", "code_review_comments", "code_review_iteration",
+              "security_review_comments", "security_review_iteration"]),
+    ("tests", ["generated_test_cases", "test_case_review_comments", "test_case_review_iteration"]),
+    ("qa", ["qa_testing_result", "qa_testing_iteration"]),
+    ("ops", ["deployment_plan", "monitoring_plan", "maintenance_plan"]),
+]
+STAGE_NAMES = [name for name, _ in STAGES]
+
+# First stage a section can affect, by whole words of its title; the earliest
+# match wins, and a section whose title matches nothing (or that has no
+# title) affects every stage
+SECTION_SCOPES = [
+    ("design", ("framework", "frameworks", "architecture", "design", "technology", "technologies", "stack")),
+    ("code", ("coding", "code", "rules", "conventions", "style")),
+    ("tests", ("test", "tests", "testing", "qa", "acceptance", "quality")),
+    ("ops", ("deploy", "deployment", "docker", "monitor", "monitoring", "maintenance", "operations",
+             "infrastructure")),
+]
+
+HEADING = re.compile(r"^#{1,6}\s")
+# "1. User Management", "1.1 Registration & Login"
+NUMBERED_TITLE = re.compile(r"^\d+(\.\d+)*\.?\s+\S")
+WORD = re.compile(r"[a-z0-9]+")
+# Lowercase words allowed inside a Title Case line
+MINOR_WORDS = {"a", "an", "and", "as", "at", "by", "for", "in", "of", "on", "or", "the", "to", "with"}
+TITLE_MAX_WORDS = 6
+
+
+def is_title(line, previous="", following=""):
+    """Whether a line opens a section: a markdown heading, a numbered title, or a
+    short line with no closing punctuation that ends in ":", stands next to a
+    blank line or is in Title Case (plain-text requirements rarely use headings)"""
+    text = line.strip()
+    if HEADING.match(line):
+        return True
+    if not text or text[0] in "-*•" or text[-1] in ".,;!?":
+        return False
+    words = text.split()
+    if NUMBERED_TITLE.match(text):
+        return len(words) <= TITLE_MAX_WORDS + 2
+    if len(words) > TITLE_MAX_WORDS:
+        return False
+    if text.endswith((":", ":-")) or not previous.strip() or not following.strip():
+        return True
+    return all(word[0].isupper() or not word[0].isalpha() or word in MINOR_WORDS for word in words)
+
+
+def split_sections(text):
+    """Split a requirement into sections at title lines (see is_title).
+
+    Returns a list of (title, body) where the title is the title line without
+    markdown or numbering, or "" for the text before the first title.
+    """
+    lines = text.splitlines()
+    sections, title, body = [], "", []
+    for index, line in enumerate(lines):
+        previous = lines[index - 1] if index else ""
+        following = lines[index + 1] if index + 1 < len(lines) else ""
+        if line.strip() and is_title(line, previous, following):
+            sections.append((title, body))
+            title, body = re.sub(r"^(#+|\d+(\.\d+)*\.?)\s*", "", line.strip()).rstrip(":-").strip(), []
+        body.append(line.rstrip())
+    sections.append((title, body))
+    return [(title, "\n".join(body).strip()) for title, body in sections if title or "".join(body).strip()]
+
+
+def section_scope(title):
+    words = set(WORD.findall(title.lower()))
+    for stage, keywords in SECTION_SCOPES:
+        if words.intersection(keywords):
+            return stage
+    return STAGE_NAMES[0]
+
+
+def section_hashes(text):
+    """One record per section: title, content hash and the first stage it affects"""
+    return [{"title": title, "hash": hashlib.sha256(body.encode("utf-8")).hexdigest(),
+             "scope": section_scope(title)} for title, body in split_sections(text)]
+
+
+def stage_dependencies(sections):
+    """Section hashes each stage depends on: every section scoped to it or an earlier stage"""
+    return {stage: sorted(s["hash"] for s in sections if STAGE_NAMES.index(s["scope"]) <= position)
+            for position, stage in enumerate(STAGE_NAMES)}
+
+
+def first_invalid_stage(previous, dependencies):
+    """The earliest stage whose sections changed since `previous`, or None when nothing did"""
+    if not previous:
+        return STAGE_NAMES[0]
+    for stage in STAGE_NAMES:
+        if previous.get("depends_on", {}).get(stage) != dependencies[stage]:
+            return stage
+    return None
+
+
+def reusable_fields(previous, entry):
+    """State fields of the stages before `entry`, taken from the previous run"""
+    artifacts = previous.get("artifacts", {}) if previous else {}
+    stop = STAGE_NAMES.index(entry) if entry else len(STAGES)
+    return {field: artifacts[field] for _, fields in STAGES[:stop] for field in fields if field in artifacts}
+
+
+def requirement_key(requirement=None, requirement_path=None):
+    """Store key of a requirement: its file path, or a digest of its whole text.
+
+    A requirement passed as text therefore only matches its own earlier run
+    when unchanged; give run_incremental a `store_key` to re-run edits of it.
+    """
+    source = os.path.abspath(requirement_path) if requirement_path else (requirement or "").strip()
+    return hashlib.sha256(source.encode("utf-8")).hexdigest()[:16]
+
+
+class ArtifactStore:
+    """Artifacts, section hashes and stage dependencies of the last run of each requirement"""
+
+    def __init__(self, path=ARTIFACT_DIR):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def _file(self, key):
+        return os.path.join(self.path, f"{key}.json")
+
+    def load(self, key):
+        try:
+            with open(self._file(key), encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable artifact record {key}: {e}")
+            return None
+
+    def save(self, key, sections, state):
+        record = {
+            "sections": sections,
+            "depends_on": stage_dependencies(sections),
+            "artifacts": {field: state.get(field) for _, fields in STAGES for field in fields},
+        }
+        with self._lock:
+            os.makedirs(self.path, exist_ok=True)
+            tmp = self._file(key) + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(record, f, ensure_ascii=False)
+            os.replace(tmp, self._file(key))
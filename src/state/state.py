@@ -1,9 +1,17 @@
 
-from typing import TypedDict, List, Union
+import os
+import operator
+from typing import TypedDict, List, Union, Annotated
 from langchain_core.messages import HumanMessage, SystemMessage, AIMessage
 
 MAX_ITERATIONS = 10
 
+# Tokens a run may spend before review loops stop asking for revisions (0 = no limit)
+DEFAULT_TOKEN_BUDGET = int(os.getenv("WORKFLOW_TOKEN_BUDGET", "0"))
+
+# Requirement file read when a run is started without requirement text
+DEFAULT_REQUIREMENT_PATH = "req_build.md"
+
 APPROVED_PHRASES = {
     "user_stories": "here is my approval for all user stories",
     "design_doc": "go ahead",
@@ -13,7 +21,27 @@ APPROVED_PHRASES = {
     "qa_testing": "qa testing passed"
 }
 
+
+def append_messages(left, right):
+    """Append-only reducer for the conversation trace.
+
+    Nodes return only the messages they produced instead of rebuilding the
+    state around the whole trace, and the reducer extends the accumulated
+    list in place, so an update costs the size of the delta, not of the
+    history. The channel owns that list: the first update is copied, and
+    checkpoints (written with durability="sync") are serialized before the
+    next update, but a state snapshot held across steps sees later messages.
+    """
+    if not right:
+        return left
+    if not left:
+        return list(right)
+    left.extend(right)
+    return left
+
+
 class GraphState(TypedDict):
+    requirement_path: str
     user_requirement: str
     generated_user_stories: str
     po_review_comment: str
@@ -34,4 +62,10 @@ class GraphState(TypedDict):
     deployment_plan: str
     monitoring_plan: str
     maintenance_plan: str
-    messages: List[Union[HumanMessage, SystemMessage, AIMessage]]
+    messages: Annotated[List[Union[HumanMessage, SystemMessage, AIMessage]], append_messages]
+    # One record per LLM call (node, iteration, tokens, latency, retries); appended by the nodes
+    llm_calls: Annotated[List[dict], operator.add]
+    tokens_used: Annotated[int, operator.add]
+    token_budget: int
+    # Stage an incremental re-run starts at (see src/state/artifacts.py); empty for a full run
+    rerun_from: str
@@ -0,0 +1,251 @@
+
+"""Run the SDLC workflow over many requirement files.
+
+    python -m src.ui.batch requirements/ --out batch_output --concurrency 4
+    python -m src.ui.batch "specs/*.md" --mode asyncio --provider-limit google=3
+"""
+
+import os
+import math
+import glob
+import json
+import time
+import uuid
+import asyncio
+import logging
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from src.llms.limits import (parse_limits, parse_rate_limits, set_provider_concurrency,
+                             set_provider_rate_limit, provider_limiter_stats, provider_rate_limiter_stats)
+from src.llms.cache import llm_cache_stats
+from src.llms.failover import breaker_stats
+from src.llms.hedging import hedge_stats
+from src.llms.pool import warm_up_clients, client_pool_stats
+from src.nodes.memo import memo_stats
+from src.graph.checkpoint import CHECKPOINT_PATH
+from src.ui.run_workflow import run_workflow, arun_workflow
+
+logger = logging.getLogger(__name__)
+
+
+def find_requirement_files(source):
+    """Requirement files in a directory (*.md) or matching a glob pattern"""
+    if os.path.isdir(source):
+        pattern = os.path.join(source, "*.md")
+    else:
+        pattern = source
+    return sorted(path for path in glob.glob(pattern) if os.path.isfile(path))
+
+
+def output_dir_for(path, out_dir, taken):
+    """Per-run output directory named after the requirement file"""
+    stem = os.path.splitext(os.path.basename(path))[0]
+    name, index = stem, 1
+    while name in taken:
+        index += 1
+        name = f"{stem}_{index}"
+    taken.add(name)
+    return os.path.join(out_dir, name)
+
+
+def write_artifacts(run_dir, result, summary):
+    """Write each text artifact of a run to its own markdown file"""
+    os.makedirs(run_dir, exist_ok=True)
+    for key, value in result.items():
+        if isinstance(value, str) and key not in ("requirement_path", "rerun_from"):
+            with open(os.path.join(run_dir, f"{key}.md"), "w", encoding="utf-8") as f:
+                f.write(value)
+    with open(os.path.join(run_dir, "result.json"), "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2)
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, min(len(ordered), math.ceil(pct / 100 * len(ordered))))
+    return ordered[rank - 1]
+
+
+def _record(path, run_dir, run_id, started, result=None, error=None):
+    summary = {
+        "requirement_path": path,
+        "run_id": run_id,
+        "output_dir": run_dir,
+        "latency_seconds": time.perf_counter() - started,
+        "status": "failed" if error else "completed",
+    }
+    if error:
+        summary["error"] = repr(error)
+        logger.error(f"Run {run_id} for {path} failed: {error}")
+    else:
+        summary.update({key: value for key, value in result.items()
+                        if key.endswith("_iteration")})
+        calls = result.get("llm_calls", [])
+        summary["llm_calls"] = len(calls)
+        summary["llm_retries"] = sum(call.get("retries", 0) for call in calls)
+        summary["input_tokens"] = sum(call.get("input_tokens", 0) for call in calls)
+        summary["output_tokens"] = sum(call.get("output_tokens", 0) for call in calls)
+        # Per node and iteration token ledger
+        summary["ledger"] = [{key: call.get(key) for key in
+                              ("node", "iteration", "model", "input_tokens", "output_tokens", "latency_seconds")}
+                             for call in calls]
+        write_artifacts(run_dir, result, summary)
+    return summary
+
+
+def _run_one(path, run_dir, options):
+    run_id = f"batch-{uuid.uuid4().hex}"
+    started = time.perf_counter()
+    try:
+        result = run_workflow(requirement_path=path, run_id=run_id, **options)
+    except Exception as e:
+        return _record(path, run_dir, run_id, started, error=e)
+    return _record(path, run_dir, run_id, started, result=result)
+
+
+async def _arun_one(path, run_dir, options, semaphore):
+    async with semaphore:
+        run_id = f"batch-{uuid.uuid4().hex}"
+        started = time.perf_counter()
+        try:
+            result = await arun_workflow(requirement_path=path, run_id=run_id, **options)
+        except Exception as e:
+            return _record(path, run_dir, run_id, started, error=e)
+        return _record(path, run_dir, run_id, started, result=result)
+
+
+def run_batch(paths, out_dir, concurrency=4, mode="threads", parallel_reviews=False, hedge=False,
+              routing=None, token_budget=None, overlap_tests=False, parallel_ops=False, refine_ops=False,
+              memoize=False, checkpoint_path=None):
+    """Run every requirement file and return one summary dict per run
+
+    With a `checkpoint_path` every run is checkpointed under the run id in its
+    summary, so an interrupted one can be resumed.
+    """
+    taken = set()
+    jobs = [(path, output_dir_for(path, out_dir, taken)) for path in paths]
+    options = {"parallel_reviews": parallel_reviews, "token_budget": token_budget, "overlap_tests": overlap_tests,
+               "parallel_ops": parallel_ops, "refine_ops": refine_ops, "memoize": memoize,
+               "checkpoint_path": checkpoint_path,
+               "options": {"hedge": hedge, "routing": routing, "priority": "batch"}}
+
+    if mode == "asyncio":
+        async def main():
+            semaphore = asyncio.Semaphore(concurrency)
+            return await asyncio.gather(*(
+                _arun_one(path, run_dir, options, semaphore) for path, run_dir in jobs))
+        return list(asyncio.run(main()))
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        return list(pool.map(lambda job: _run_one(job[0], job[1], options), jobs))
+
+
+def print_report(summaries, wall_seconds):
+    latencies = [s["latency_seconds"] for s in summaries if s["status"] == "completed"]
+    failed = [s for s in summaries if s["status"] == "failed"]
+    print("\n=== BATCH SUMMARY ===")
+    print(f"Runs: {len(summaries)} ({len(latencies)} completed, {len(failed)} failed)")
+    print(f"Wall time: {wall_seconds:.1f}s")
+    print(f"Throughput: {len(latencies) / wall_seconds * 60 if wall_seconds else 0:.2f} runs/min")
+    print(f"Latency p50: {percentile(latencies, 50):.1f}s  "
+          f"p90: {percentile(latencies, 90):.1f}s  "
+          f"p99: {percentile(latencies, 99):.1f}s  "
+          f"max: {max(latencies, default=0):.1f}s")
+    completed = [s for s in summaries if s["status"] == "completed"]
+    print(f"LLM calls: {sum(s['llm_calls'] for s in completed)} "
+          f"({sum(s['llm_retries'] for s in completed)} retries)")
+    print(f"Tokens: {sum(s['input_tokens'] for s in completed)} in, "
+          f"{sum(s['output_tokens'] for s in completed)} out")
+    cache = llm_cache_stats()
+    if cache is not None:
+        print(f"LLM cache: {cache['hits']}/{cache['hits'] + cache['misses']} lookups hit ({cache['hit_rate']:.0%}), "
+              f"{cache['entries']} entries, {cache['evictions']} evicted")
+    for provider, stats in provider_rate_limiter_stats().items():
+        print(f"Rate limit wait ({provider}): {stats['waited_calls']}/{stats['calls']} calls waited, "
+              f"avg {stats['avg_wait_seconds']:.2f}s, max {stats['max_wait_seconds']:.2f}s")
+    for provider, stats in provider_limiter_stats().items():
+        for priority, waits in stats["waits"].items():
+            print(f"Provider slot wait ({provider}, {priority}): {waits['acquired']} calls, "
+                  f"avg {waits['avg_wait_seconds']:.2f}s, max {waits['max_wait_seconds']:.2f}s")
+    for key, stats in client_pool_stats().items():
+        if stats["max_wait_seconds"] > 0:
+            size = f"/{stats['size']}" if stats["size"] else ""
+            print(f"Client pool {key}: {stats['created']}{size} clients, {stats['checkouts']} checkouts, "
+                  f"avg wait {stats['avg_wait_seconds']:.2f}s, max {stats['max_wait_seconds']:.2f}s")
+    for node, stats in hedge_stats().items():
+        if stats["hedged"]:
+            print(f"Hedged {node}: {stats['hedged']}/{stats['calls']} calls ({stats['hedge_rate']:.0%}), "
+                  f"hedge won {stats['win_rate']:.0%}")
+    for node, stats in memo_stats().items():
+        if stats["hits"]:
+            print(f"Memoized {node}: {stats['hits']}/{stats['hits'] + stats['misses']} calls ({stats['hit_rate']:.0%}), "
+                  f"saved {stats['saved_tokens']} tokens, {stats['saved_seconds']:.1f}s")
+    for name, stats in breaker_stats().items():
+        if stats["trips"]:
+            print(f"Circuit {name}: {stats['state']}, tripped {stats['trips']} times, "
+                  f"{stats['rejected']} calls diverted")
+    for summary in failed:
+        print(f"FAILED {summary['requirement_path']}: {summary['error']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the SDLC workflow over many requirement files")
+    parser.add_argument("source", help="directory of .md requirement files or a glob pattern")
+    parser.add_argument("--out", default="batch_output",
+                        help="directory for per-run artifacts (default: %(default)s)")
+    parser.add_argument("--concurrency", type=int, default=4,
+                        help="number of runs in flight (default: %(default)s)")
+    parser.add_argument("--mode", choices=["threads", "asyncio"], default="threads",
+                        help="run with a thread pool or a single event loop (default: %(default)s)")
+    parser.add_argument("--provider-limit", default="",
+                        help="per-provider cap on concurrent LLM calls, e.g. google=4,groq=2")
+    parser.add_argument("--rate-limit", default="",
+                        help="per-provider requests/min and tokens/min, e.g. google=15/1000000")
+    parser.add_argument("--parallel-reviews", action="store_true",
+                        help="run code and security reviews concurrently")
+    parser.add_argument("--overlap-tests", action="store_true",
+                        help="write and review test cases alongside the code review loop")
+    parser.add_argument("--parallel-ops", action="store_true",
+                        help="draft the deployment, monitoring and maintenance plans concurrently")
+    parser.add_argument("--refine-ops", action="store_true",
+                        help="with --parallel-ops, align the monitoring and maintenance plans with the deployment plan")
+    parser.add_argument("--memoize", action="store_true",
+                        help="reuse node replies for inputs already seen in this batch")
+    parser.add_argument("--hedge", action="store_true",
+                        help="send a second request when an LLM call runs past its usual latency")
+    parser.add_argument("--routing", metavar="JSON",
+                        help="per-node model overrides for these runs, same format as the routing table's nodes")
+    parser.add_argument("--token-budget", type=int,
+                        help="tokens per run before review loops stop asking for revisions")
+    parser.add_argument("--checkpoint", action="store_true",
+                        help="checkpoint every run to WORKFLOW_CHECKPOINT_PATH so it can be resumed")
+    args = parser.parse_args(argv)
+
+    paths = find_requirement_files(args.source)
+    if not paths:
+        parser.error(f"No requirement files found for {args.source}")
+
+    for provider, limit in parse_limits(args.provider_limit).items():
+        set_provider_concurrency(provider, limit)
+    for provider, (rpm, tpm) in parse_rate_limits(args.rate_limit).items():
+        set_provider_rate_limit(provider, rpm, tpm)
+
+    warm_up_clients()
+    logger.info(f"Running {len(paths)} requirement files with concurrency {args.concurrency} ({args.mode})")
+    started = time.perf_counter()
+    routing = None
+    if args.routing:
+        with open(args.routing, encoding="utf-8") as f:
+            routing = json.load(f)
+
+    summaries = run_batch(paths, args.out, args.concurrency, args.mode, args.parallel_reviews, args.hedge,
+                          routing, args.token_budget, args.overlap_tests, args.parallel_ops, args.refine_ops,
+                          args.memoize, CHECKPOINT_PATH if args.checkpoint else None)
+    print_report(summaries, time.perf_counter() - started)
+    return 0 if all(s["status"] == "completed" for s in summaries) else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,6 +1,15 @@
 
 from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
-from src.graph.workflow import build_workflow_graph
+from src.graph.workflow import get_workflow_graph
+from src.graph.checkpoint import (CHECKPOINT_PATH, get_checkpointer, aopen_checkpointer, run_config,
+                                  persisted_options)
+from src.state.state import DEFAULT_REQUIREMENT_PATH, DEFAULT_TOKEN_BUDGET
+from src.state.artifacts import (ArtifactStore, STAGE_NAMES, section_hashes, stage_dependencies,
+                                 first_invalid_stage, reusable_fields, requirement_key)
+from src.nodes.common import read_file
+from src.nodes.memo import MEMOIZE
+import json
+import uuid
 import logging
 from typing import Dict
 
@@ -12,9 +21,16 @@ logging.basicConfig(level=logging.INFO,
 logger = logging.getLogger(__name__)
 
 
-def run_workflow(live_callback=None) -> Dict:
-    initial_state = {
-        "user_requirement": "",
+def build_initial_state(requirement=None, requirement_path=None, token_budget=None) -> Dict:
+    """Initial graph state for one run.
+
+    Each run carries its own requirement text or file path, so concurrent
+    runs in one process never share an input file. `token_budget` (default
+    WORKFLOW_TOKEN_BUDGET, 0 for none) caps the tokens spent in review loops.
+    """
+    return {
+        "requirement_path": requirement_path or DEFAULT_REQUIREMENT_PATH,
+        "user_requirement": requirement or "",
         "generated_user_stories": "",
         "po_review_comment": "",
         "stories_correction_iteration": 1,
@@ -34,23 +50,201 @@ def run_workflow(live_callback=None) -> Dict:
         "deployment_plan": "",
         "monitoring_plan": "",
         "maintenance_plan": "",
-        "messages": [HumanMessage(content="Getting requirements from file")]
+        "llm_calls": [],
+        "tokens_used": 0,
+        "token_budget": DEFAULT_TOKEN_BUDGET if token_budget is None else token_budget,
+        "rerun_from": "",
+        "messages": [HumanMessage(content="Getting requirements from input" if requirement
+                                  else "Getting requirements from file")]
     }
 
-    graph = build_workflow_graph(live_callback=live_callback)
 
-    def recursive_hook(state):
-        if live_callback:
-            live_callback(state.get("messages", []))
+def run_workflow(live_callback=None, parallel_reviews=False, run_id=None,
+                 checkpoint_path=None, stream_callback=None,
+                 requirement=None, requirement_path=None, options=None,
+                 token_budget=None, overlap_tests=False, parallel_ops=False,
+                 refine_ops=False, seed=None, memoize=MEMOIZE) -> Dict:
+    """Run the workflow, optionally checkpointing state after every node under `run_id`.
+
+    Checkpoints are only written when `checkpoint_path` is given (e.g.
+    CHECKPOINT_PATH); each one stores the whole state, so the file grows with
+    every node of every run. A checkpointed run that was interrupted can be
+    continued with `resume(run_id)`, which restores the graph shape,
+    `memoize` and the JSON-serializable `options`. `stream_callback(node_name, text)`
+    receives each node's reply while it is being generated. The requirement is
+    taken from `requirement` text, else read from `requirement_path`
+    (default req_build.md). `options` are per-run node settings passed
+    through the config, e.g. {"hedge": True}. Token usage per call is in
+    the result's `llm_calls` and `tokens_used`. `overlap_tests` writes the
+    test cases alongside the code review loop; `parallel_ops` drafts the
+    deployment, monitoring and maintenance plans concurrently, `refine_ops`
+    then aligns them (see build_workflow_graph). `seed` values replace those
+    of the initial state (run_incremental seeds reused artifacts this way).
+    `memoize` reuses node replies for inputs already seen in this process.
+    The compiled graph is shared by every run with the same graph options;
+    callbacks and per-run settings go in through the run config.
+    """
+    initial_state = {**build_initial_state(requirement, requirement_path, token_budget), **(seed or {})}
+    run_id = run_id or uuid.uuid4().hex
+    checkpointer = get_checkpointer(checkpoint_path) if checkpoint_path else None
+
+    graph = get_workflow_graph(parallel_reviews=parallel_reviews,
+                               checkpointer=checkpointer,
+                               overlap_tests=overlap_tests,
+                               parallel_ops=parallel_ops,
+                               refine_ops=refine_ops)
+
+    run_options = {"memoize": memoize, **(options or {})}
+    config = run_config(run_id, {**run_options, "stream_callback": stream_callback, "live_callback": live_callback},
+                        parallel_reviews=parallel_reviews, overlap_tests=overlap_tests,
+                        parallel_ops=parallel_ops, refine_ops=refine_ops,
+                        run_options=persisted_options(run_options))
+
+    logger.info(f"Starting workflow run {run_id}")
+    if checkpointer:
+        # Write each checkpoint before the next node starts so a crash loses at most one node
+        result = graph.invoke(initial_state, config, durability="sync")
+    else:
+        result = graph.invoke(initial_state, config)
+    return result
+
+
+def resume(run_id, live_callback=None, checkpoint_path=CHECKPOINT_PATH,
+           stream_callback=None) -> Dict:
+    """Continue a checkpointed run from its last completed node.
+
+    Nodes that already completed are not re-run, so their LLM calls are not
+    repeated. The run keeps its graph options, `memoize` and per-run options
+    (routing, hedging, priority, ...); callbacks are the ones passed here.
+    A run that already finished returns its final state.
+    """
+    checkpointer = get_checkpointer(checkpoint_path)
+    checkpoint = checkpointer.get_tuple(run_config(run_id))
+    if checkpoint is None:
+        raise ValueError(f"No checkpoint found for run {run_id}")
+
+    parallel_reviews = checkpoint.metadata.get("parallel_reviews", False)
+    overlap_tests = checkpoint.metadata.get("overlap_tests", False)
+    parallel_ops = checkpoint.metadata.get("parallel_ops", False)
+    refine_ops = checkpoint.metadata.get("refine_ops", False)
+    run_options = checkpoint.metadata.get("run_options") or "{}"
+    graph = get_workflow_graph(parallel_reviews=parallel_reviews,
+                               checkpointer=checkpointer,
+                               overlap_tests=overlap_tests,
+                               parallel_ops=parallel_ops,
+                               refine_ops=refine_ops)
+    # Same metadata as the original run, so the run can be resumed again
+    config = run_config(run_id, {**json.loads(run_options), "stream_callback": stream_callback,
+                                 "live_callback": live_callback},
+                        parallel_reviews=parallel_reviews, overlap_tests=overlap_tests,
+                        parallel_ops=parallel_ops, refine_ops=refine_ops, run_options=run_options)
+
+    snapshot = graph.get_state(config)
+    if not snapshot.next:
+        logger.info(f"Workflow run {run_id} already completed")
+        return snapshot.values
+
+    logger.info(f"Resuming workflow run {run_id} at {', '.join(snapshot.next)}")
+    return graph.invoke(None, config, durability="sync")
 
-    result = graph.invoke(initial_state, {
-        "recursion_limit": 100,
-        "recursion_hook": recursive_hook
-    })
+
+async def arun_workflow(live_callback=None, parallel_reviews=False, run_id=None,
+                        checkpoint_path=None, stream_callback=None, requirement=None,
+                        requirement_path=None, options=None, token_budget=None,
+                        overlap_tests=False, parallel_ops=False, refine_ops=False, seed=None,
+                        memoize=MEMOIZE) -> Dict:
+    """Async counterpart of run_workflow.
+
+    Every node awaits `llm.ainvoke`, so a single event loop can drive many
+    runs concurrently, e.g. `await asyncio.gather(*(arun_workflow(requirement_path=p) for p in paths))`.
+    With a `checkpoint_path`, checkpoints go to the same SQLite file as
+    run_workflow's, so an interrupted run can be continued with `resume(run_id)`.
+    """
+    initial_state = {**build_initial_state(requirement, requirement_path, token_budget), **(seed or {})}
+    run_id = run_id or uuid.uuid4().hex
+
+    graph = get_workflow_graph(parallel_reviews=parallel_reviews,
+                               use_async=True,
+                               overlap_tests=overlap_tests,
+                               parallel_ops=parallel_ops,
+                               refine_ops=refine_ops)
+
+    run_options = {"memoize": memoize, **(options or {})}
+    config = run_config(run_id, {**run_options, "stream_callback": stream_callback, "live_callback": live_callback},
+                        parallel_reviews=parallel_reviews, overlap_tests=overlap_tests,
+                        parallel_ops=parallel_ops, refine_ops=refine_ops,
+                        run_options=persisted_options(run_options))
+
+    logger.info(f"Starting workflow run {run_id}")
+    if not checkpoint_path:
+        return await graph.ainvoke(initial_state, config)
+    async with aopen_checkpointer(checkpoint_path) as checkpointer:
+        # The shared compiled graph, bound to this run's checkpointer connection
+        graph = graph.copy({"checkpointer": checkpointer})
+        return await graph.ainvoke(initial_state, config, durability="sync")
+
+
+def run_incremental(requirement=None, requirement_path=None, store=None, store_key=None,
+                    **run_kwargs) -> Dict:
+    """Run the workflow, reusing what is still valid from the requirement's previous run.
+
+    The requirement is split into sections and each section is hashed; each
+    stage (stories, design, code, tests, qa, ops) depends on the sections
+    scoped to it or an earlier stage (see src/state/artifacts.py). Stages
+    whose sections are unchanged are seeded from the artifact store and the
+    graph starts at the first invalidated one. The result's `rerun_from`
+    names that stage. Other arguments are passed to run_workflow.
+    """
+    store = store or ArtifactStore()
+    if requirement is None:
+        requirement_path = requirement_path or DEFAULT_REQUIREMENT_PATH
+        requirement = read_file(requirement_path, "No requirements found")
+    key = store_key or requirement_key(requirement, requirement_path)
+    sections = section_hashes(requirement)
+    if len(sections) == 1:
+        logger.warning(f"Requirement {key} has no section titles, so any edit re-runs every stage")
+    previous = store.load(key)
+    entry = first_invalid_stage(previous, stage_dependencies(sections))
+    reused = reusable_fields(previous, entry)
+
+    if entry is None:
+        logger.info(f"Requirement {key} unchanged, reusing every artifact of the previous run")
+        result = {**build_initial_state(requirement, requirement_path, run_kwargs.get("token_budget")), **reused}
+        result["messages"] = result["messages"] + [AIMessage(content="Requirement unchanged, reusing the previous run")]
+        return result
+
+    seed = {}
+    if entry != STAGE_NAMES[0]:
+        stages = STAGE_NAMES[:STAGE_NAMES.index(entry)]
+        logger.info(f"Requirement {key} changed from stage {entry}, reusing {', '.join(stages)}")
+        initial = build_initial_state(requirement, requirement_path)
+        seed = {**reused, "rerun_from": entry, "messages": initial["messages"] + [
+            AIMessage(content=f"Requirement changed; reusing {', '.join(stages)} from the previous run")]}
+    result = run_workflow(requirement=requirement, requirement_path=requirement_path, seed=seed, **run_kwargs)
+    store.save(key, sections, result)
     return result
 
 
 if __name__ == "__main__":
-    final_output = run_workflow()
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run the SDLC workflow")
+    parser.add_argument("--resume", metavar="RUN_ID",
+                        help="continue a checkpointed run instead of starting a new one")
+    parser.add_argument("--requirement", metavar="PATH", default=DEFAULT_REQUIREMENT_PATH,
+                        help="requirement file to run (default: %(default)s)")
+    parser.add_argument("--incremental", action="store_true",
+                        help="reuse the artifacts of the requirement's previous run that its edits do not affect")
+    parser.add_argument("--checkpoint", action="store_true",
+                        help="checkpoint the run to WORKFLOW_CHECKPOINT_PATH so it can be resumed")
+    args = parser.parse_args()
+
+    checkpoint_path = CHECKPOINT_PATH if args.checkpoint else None
+    if args.resume:
+        final_output = resume(args.resume)
+    elif args.incremental:
+        final_output = run_incremental(requirement_path=args.requirement, checkpoint_path=checkpoint_path)
+    else:
+        final_output = run_workflow(requirement_path=args.requirement, checkpoint_path=checkpoint_path)
     for key, value in final_output.items():
         print(f"\n=== {key.upper()} ===\n{value}\n")
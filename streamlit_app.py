@@ -8,15 +8,15 @@ st.title("🚀 AI-Powered Software Development Workflow")
 
 uploaded_file = st.file_uploader(
     "📄 Upload Requirement File (.md)", type=["md"])
+requirement = None
 if uploaded_file:
-    requirement_path = "req_build.md"
-    with open(requirement_path, "wb") as f:
-        f.write(uploaded_file.read())
+    # Keep the upload in memory for this session instead of a shared req_build.md
+    requirement = uploaded_file.getvalue().decode("utf-8")
     st.success("Requirement file uploaded successfully!")
 
 if st.button("Start Workflow 🚦"):
     with st.spinner("Running the automated dev workflow..."):
-        result = run_workflow()
+        result = run_workflow(requirement=requirement)
 
     st.success("✅ Workflow completed!")
     st.markdown("---")
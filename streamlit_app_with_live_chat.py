@@ -4,9 +4,12 @@ import logging
 import re
 from src.ui.run_workflow import run_workflow
 from src.llms.factory import get_llm  # Import get_llm directly
+from src.llms.pool import warm_up_clients
+from src.graph.checkpoint import CHECKPOINT_PATH
 from langchain_core.messages import HumanMessage, SystemMessage, AIMessage
 import pickle
 import json
+import uuid
 
 # Initialize session state for persistence
 if "workflow_ran" not in st.session_state:
@@ -25,12 +28,25 @@ if "openai_api_key" not in st.session_state:
     st.session_state["openai_api_key"] = ""
 if "current_section" not in st.session_state:
     st.session_state["current_section"] = "Main View"
+if "run_id" not in st.session_state:
+    st.session_state["run_id"] = None
+if "requirement" not in st.session_state:
+    st.session_state["requirement"] = None
 
 # Set page config
 st.set_page_config(
     page_title="Agentic AI SDLC Workflow", layout="wide")
 st.title("🚀 Agentic AI SDLC Workflow")
 
+
+@st.cache_resource(show_spinner=False)
+def warm_up_llm_clients():
+    """Build the routed LLM clients once per server process (needs the API keys in the environment)"""
+    warm_up_clients()
+
+
+warm_up_llm_clients()
+
 # ========== Sidebar Navigation ==========
 st.sidebar.header("📑 Navigation")
 
@@ -86,16 +102,27 @@ st.session_state["google_api_key"] = st.sidebar.text_input(
 # Modify run_workflow to accept API keys
 
 
-def modified_run_workflow(live_callback=None):
+def modified_run_workflow(live_callback=None, resume_run=False, stream_callback=None):
     # Import inside function to avoid circular imports
     from src.ui.run_workflow import run_workflow as original_workflow
+    from src.ui.run_workflow import resume as resume_workflow
 
     # Create a context manager or modify the workflow to use passed API keys
     os.environ["GROQ_API_KEY"] = st.session_state["groq_api_key"]
     os.environ["GOOGLE_API_KEY"] = st.session_state["google_api_key"]
     os.environ["OPENAI_API_KEY"] = st.session_state["openai_api_key"]
 
-    return original_workflow(live_callback=live_callback)
+    if resume_run:
+        return resume_workflow(st.session_state["run_id"], live_callback=live_callback,
+                               stream_callback=stream_callback)
+
+    # Record the run id before starting so a crashed run can be resumed in this session
+    st.session_state["run_id"] = uuid.uuid4().hex
+    return original_workflow(live_callback=live_callback,
+                             run_id=st.session_state["run_id"],
+                             checkpoint_path=CHECKPOINT_PATH,
+                             stream_callback=stream_callback,
+                             requirement=st.session_state["requirement"])
 
 # ========== File Loading Helper ==========
 
@@ -104,7 +131,7 @@ def load_saved_state():
     """Load state from disk if available"""
     try:
         if os.path.exists("streamlit_state.json"):
-            with open("streamlit_state.json", "r") as f:
+            with open("streamlit_state.json", "r", encoding="utf-8") as f:
                 data = json.load(f)
                 st.session_state["workflow_ran"] = data["workflow_ran"]
                 st.session_state["file_uploaded"] = data["file_uploaded"]
@@ -123,7 +150,7 @@ def save_current_state():
     """Save current state to disk"""
     try:
         # Save simple session variables to JSON
-        with open("streamlit_state.json", "w") as f:
+        with open("streamlit_state.json", "w", encoding="utf-8") as f:
             data = {
                 "workflow_ran": st.session_state["workflow_ran"],
                 "file_uploaded": st.session_state["file_uploaded"],
@@ -139,8 +166,11 @@ def save_current_state():
         st.error(f"Error saving session: {e}")
 
 
-# Try to load saved state from disk at startup
-load_saved_state()
+# Try to load saved state from disk once per session; the run id and requirement
+# stay in st.session_state only, since the state file is shared by every session
+if "state_restored" not in st.session_state:
+    st.session_state["state_restored"] = True
+    load_saved_state()
 
 # ========== Live Logger for Progress ==========
 
@@ -158,9 +188,16 @@ class StreamlitLoggerHandler(logging.Handler):
 
 
 # ========== Live Chat Placeholder ==========
+stream_placeholder = st.empty()
 chat_placeholder = st.empty()
 
 
+def live_stream_renderer(node_name, text):
+    # Partial reply of the node that is currently generating
+    with stream_placeholder.container():
+        st.markdown(f"**🤖 {node_name}** _(generating...)_\n\n{text}")
+
+
 def live_chat_renderer(messages):
     # Save messages to session state for persistence
     st.session_state["chat_messages"] = messages
@@ -223,14 +260,17 @@ def live_chat_renderer(messages):
 # ========== Run Workflow Function ==========
 
 
-def run_and_save_workflow():
+def run_and_save_workflow(resume_run=False):
     log_container = st.empty()
     logger_handler = StreamlitLoggerHandler(log_container)
     logger_handler.setFormatter(logging.Formatter("%(asctime)s - %(message)s"))
     logging.getLogger().addHandler(logger_handler)
 
     with st.spinner("Running the workflow with live chat..."):
-        result = modified_run_workflow(live_callback=live_chat_renderer)
+        result = modified_run_workflow(
+            live_callback=live_chat_renderer, resume_run=resume_run,
+            stream_callback=live_stream_renderer)
+    stream_placeholder.empty()
 
     # Save results to session state
     st.session_state["workflow_ran"] = True
@@ -277,8 +317,8 @@ if selected_section == "Main View":
         key="file_uploader")
 
     if uploaded_file:
-        with open("req_build.md", "wb") as f:
-            f.write(uploaded_file.read())
+        # Keep the upload with this session instead of a shared req_build.md
+        st.session_state["requirement"] = uploaded_file.getvalue().decode("utf-8")
         st.session_state["file_uploaded"] = True
         save_current_state()  # Save state after file upload
         st.success("Requirement file uploaded successfully!")
@@ -287,6 +327,11 @@ if selected_section == "Main View":
     if st.button("Start Workflow 🚦", key="start_workflow"):
         result = run_and_save_workflow()
         st.success("✅ Workflow completed!")
+    elif st.session_state["run_id"] and not st.session_state["workflow_ran"] and \
+            st.button("Resume Workflow ⏯", key="resume_workflow"):
+        # Continue an interrupted run from its last checkpointed node
+        result = run_and_save_workflow(resume_run=True)
+        st.success("✅ Workflow completed!")
     else:
         # Use cached result from session state if available
         result = st.session_state["workflow_result"]
@@ -303,6 +348,8 @@ if selected_section == "Main View":
             st.session_state["workflow_result"] = None
             st.session_state["chat_messages"] = []
             st.session_state["file_uploaded"] = False
+            st.session_state["run_id"] = None
+            st.session_state["requirement"] = None
 
             # Remove saved files
             if os.path.exists("streamlit_state.json"):
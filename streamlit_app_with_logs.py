@@ -26,10 +26,10 @@ class StreamlitLoggerHandler(logging.Handler):
 # ========== Requirement Upload ==========
 uploaded_file = st.file_uploader(
     "📄 Upload Requirement File (.md)", type=["md"])
+requirement = None
 if uploaded_file:
-    requirement_path = "req_build.md"
-    with open(requirement_path, "wb") as f:
-        f.write(uploaded_file.read())
+    # Keep the upload in memory for this session instead of a shared req_build.md
+    requirement = uploaded_file.getvalue().decode("utf-8")
     st.success("Requirement file uploaded successfully!")
 
 # ========== Start Workflow ==========
@@ -55,7 +55,8 @@ if st.button("Start Workflow 🚦"):
                     st.markdown(
                         f"**{icon} {role}**\n\n{msg.content.strip()}\n\n---")
 
-        result = run_workflow(live_callback=live_chat_view)
+        result = run_workflow(live_callback=live_chat_view,
+                              requirement=requirement)
 
     logging.getLogger().removeHandler(logger_handler)
     st.success("✅ Workflow completed!")
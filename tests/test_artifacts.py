@@ -0,0 +1,30 @@
+from src.state.artifacts import (section_hashes, split_sections, stage_dependencies,
+                                 first_invalid_stage)
+
+with open("req_build.md", encoding="utf-8") as f:
+    REQUIREMENT = f.read()
+
+
+def _run(requirement):
+    return {"depends_on": stage_dependencies(section_hashes(requirement))}
+
+
+def test_plain_text_titles_split_sections():
+    titles = [title for title, _ in split_sections(REQUIREMENT)]
+    assert "Agent Frameworks" in titles
+    assert "Coding Rules" in titles
+
+
+def test_titles_set_section_scope():
+    scopes = {s["title"]: s["scope"] for s in section_hashes(REQUIREMENT)}
+    assert scopes["Agent Frameworks"] == "design"
+    assert scopes["Coding Rules"] == "code"
+
+
+def test_coding_rules_edit_reruns_from_code():
+    edited = REQUIREMENT.replace("Coding Rules", "Coding Rules\nUse type hints everywhere.", 1)
+    assert first_invalid_stage(_run(REQUIREMENT), _run(edited)["depends_on"]) == "code"
+
+
+def test_unchanged_requirement_reruns_nothing():
+    assert first_invalid_stage(_run(REQUIREMENT), _run(REQUIREMENT)["depends_on"]) is None
@@ -0,0 +1,18 @@
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration
+from src.llms.cache import SQLiteLLMCache
+from src.llms.calls import token_usage
+
+USAGE = {"input_tokens": 10, "output_tokens": 5, "total_tokens": 15}
+
+
+def test_cached_reply_spends_no_tokens(tmp_path):
+    cache = SQLiteLLMCache(path=str(tmp_path / "cache.sqlite"))
+    cache.update("prompt", "llm", [ChatGeneration(message=AIMessage(content="hi", usage_metadata=USAGE))])
+    message = cache.lookup("prompt", "llm")[0].message
+    assert message.content == "hi"
+    assert token_usage(message) == {"input_tokens": 0, "output_tokens": 0, "total_tokens": 0, "cached": True}
+
+
+def test_fresh_reply_reports_its_usage():
+    assert token_usage(AIMessage(content="hi", usage_metadata=USAGE)) == USAGE
@@ -0,0 +1,51 @@
+import pytest
+from src.llms.retry import RetryPolicy
+
+POLICY = RetryPolicy()
+
+
+def _gemini_error(handler, *args):
+    """The exception langchain_google_genai raises for a google.genai error"""
+    chat_models = pytest.importorskip("langchain_google_genai.chat_models")
+    with pytest.raises(Exception) as raised:
+        getattr(chat_models, handler)(*args)
+    return raised.value
+
+
+def test_gemini_rate_limit_is_retried():
+    errors = pytest.importorskip("google.genai.errors")
+    error = _gemini_error("_handle_client_error", errors.ClientError(
+        429, {"error": {"code": 429, "message": "Quota exceeded", "status": "RESOURCE_EXHAUSTED"}}),
+        {"model": "gemini-2.0-flash"})
+    assert POLICY.is_retryable(error)
+
+
+def test_gemini_server_error_is_retried():
+    errors = pytest.importorskip("google.genai.errors")
+    error = _gemini_error("_handle_server_error", errors.ServerError(
+        503, {"error": {"code": 503, "message": "Overloaded", "status": "UNAVAILABLE"}}))
+    assert POLICY.is_retryable(error)
+
+
+def test_gemini_invalid_request_is_not_retried():
+    errors = pytest.importorskip("google.genai.errors")
+    error = _gemini_error("_handle_client_error", errors.ClientError(
+        400, {"error": {"code": 400, "message": "Bad request", "status": "INVALID_ARGUMENT"}}),
+        {"model": "gemini-2.0-flash"})
+    assert not POLICY.is_retryable(error)
+
+
+def test_status_code_of_wrapped_error_is_followed():
+    class Wrapped(Exception):
+        pass
+
+    class Transport(Exception):
+        code = 503
+
+    try:
+        try:
+            raise Transport()
+        except Transport as e:
+            raise Wrapped() from e
+    except Wrapped as e:
+        assert POLICY.is_retryable(e)